@@ -0,0 +1,60 @@
+"""Verify resources from Python code rather than the command line.
+
+A long-running process can build a Config once and reuse it, together with
+its requests session and an executor, for many verifications::
+
+    from concurrent.futures import ThreadPoolExecutor
+    from fcrepo_verify.api import build_config, verify_resources
+
+    config = build_config({"mode": "export",
+                           "resource": "http://localhost:8080/rest",
+                           "dir": "/data/export",
+                           "binaries": True}, workers=8)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for result in verify_resources(uris, config, executor=executor):
+            if not result.verified:
+                print(result.original, result.verification)
+"""
+import logging
+
+from .iterators import get_walker
+from .loggers import Loggers
+from .model import Config
+from .verifier import FedoraImportExportVerifier
+
+
+def default_loggers():
+    """Returns Loggers that log through the "fcrepo_verify" logger, leaving
+    handlers to the embedding application."""
+    logger = logging.getLogger("fcrepo_verify")
+    return Loggers(logger, logger, logger)
+
+
+def build_config(options, auth=None, session=None, loggers=None, **kwargs):
+    """Builds a Config from a dict of import/export configuration options.
+
+    Remaining keyword arguments (workers, graph_threshold, etc.) are passed
+    on to Config. Invalid options raise ValueError.
+    """
+    if loggers is None:
+        loggers = default_loggers()
+    return Config(options, auth, loggers, None, False, session=session,
+                  **kwargs)
+
+
+def verify(config, loggers=None, executor=None):
+    """Walks the configured tree and generates a VerificationResult for each
+    resource."""
+    if loggers is None:
+        loggers = default_loggers()
+    verifier = FedoraImportExportVerifier(config, loggers)
+    return verifier.results(get_walker(config, loggers.file_only), executor)
+
+
+def verify_resources(uris, config, loggers=None, executor=None):
+    """Generates a VerificationResult for each of the given repository URIs
+    or local paths."""
+    if loggers is None:
+        loggers = default_loggers()
+    verifier = FedoraImportExportVerifier(config, loggers)
+    return verifier.verify_resources(uris, executor)
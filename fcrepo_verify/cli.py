@@ -2,11 +2,12 @@
 # -*- coding: utf-8 -*-
 import click
 import logging
+import os
+import sys
 
 from fcrepo_verify.version import __version__
 from fcrepo_verify.model import Config
 from fcrepo_verify.loggers import createLoggers
-from fcrepo_verify.verifier import FedoraImportExportVerifier
 
 
 class CredentialsParamType(click.ParamType):
@@ -46,9 +47,70 @@ class CredentialsParamType(click.ParamType):
 @click.option('--verbose', '-v',
               help='Show detailed info for each resource checked',
               is_flag=True, default=False)
+@click.option('--plan', '-p',
+              help='Inventory the resources to verify and estimate the run '
+                   'time without performing a full verification',
+              is_flag=True, default=False)
+@click.option('--workers', '-w',
+              help='Number of resources to verify concurrently',
+              type=click.IntRange(min=1), default=1)
+@click.option('--sample', '-s',
+              help='Number of resources of each type to verify when '
+                   'estimating the run time',
+              type=click.IntRange(min=0), default=10)
+@click.option('--graph-threshold', '-t',
+              help='Size in bytes of serialized RDF above which graphs are '
+                   'compared on disk rather than in memory (0 to disable)',
+              type=click.IntRange(min=0), default=64 * 1024 * 1024)
+@click.option('--containment-listing', '-c',
+              help='Verify the children of containers against directory '
+                   'listings rather than comparing containment triples',
+              is_flag=True, default=False)
+@click.option('--exclude-predicate', '-x',
+              help='Predicate to leave out of graph comparisons (may be '
+                   'given more than once)',
+              multiple=True)
+@click.option('--input', '-i', 'input_file',
+              help='Verify only the resources listed in this file: the '
+                   'failures in a CSV report from an earlier run, or a list '
+                   'of URIs or paths, one per line',
+              type=click.Path(exists=True, dir_okay=False), default=None)
+@click.option('--size-only', '-z',
+              help='Compare binaries by size only, without computing '
+                   'digests, for a quick first pass',
+              is_flag=True, default=False)
+@click.option('--timeout', '-T',
+              help='Seconds to wait for a response from the repository '
+                   'before the request is retried',
+              type=click.FloatRange(min=0, min_open=True), default=60)
+@click.option('--retries', '-r',
+              help='Number of times to retry a request that timed out or '
+                   'met a server error',
+              type=click.IntRange(min=0), default=3)
+@click.option('--hedge', '-H',
+              help='Send a duplicate of any request slower than 95% of '
+                   'recent requests and use the first response',
+              is_flag=True, default=False)
+@click.option('--max-rate', '-m',
+              help='Maximum number of requests per second to send to the '
+                   'repository',
+              type=click.FloatRange(min=0, min_open=True), default=None)
+@click.option('--digest-cache', '-d',
+              help='File in which to keep the digests of external content '
+                   'between runs (default: external-digests.json in the '
+                   'output directory)',
+              type=click.Path(dir_okay=False), default=None)
+@click.option('--server-managed-ns', '-N',
+              help='Namespace of predicates that Fedora manages, left out '
+                   'when verifying a legacy export (may be given more than '
+                   'once; default: the Fedora repository namespace)',
+              multiple=True)
 @click.version_option(__version__)
 @click.argument('configfile', type=click.Path(exists=True), required=True)
-def main(configfile, outputdir, user, logdir, loglevel, verbose):
+def main(configfile, outputdir, user, logdir, loglevel, verbose, plan,
+         workers, sample, graph_threshold, containment_listing,
+         exclude_predicate, input_file, size_only, timeout, retries,
+         hedge, max_rate, digest_cache, server_managed_ns):
     """Verify that the resources in Fedora and on disk are the same.
 
     Using a CONFIGFILE (i.e. path to an fcrepo-import-export configuration
@@ -62,11 +124,32 @@ def main(configfile, outputdir, user, logdir, loglevel, verbose):
 
     loggers.console.info("version: {0}\n".format(__version__))
 
+    if digest_cache is None:
+        digest_cache = os.path.join(outputdir, "external-digests.json")
+
     # Create configuration object and setup import/export iterators
-    config = Config(configfile, user, loggers, outputdir, verbose)
-    # Create and execute verifier logic
-    verifier = FedoraImportExportVerifier(config, loggers)
-    verifier.execute()
+    try:
+        config = Config(configfile, user, loggers, outputdir, verbose,
+                        workers, graph_threshold, containment_listing,
+                        exclude_predicate, input_file=input_file,
+                        size_only=size_only, timeout=timeout,
+                        retries=retries, hedge=hedge, max_rate=max_rate,
+                        digest_cache=digest_cache,
+                        server_managed_namespaces=server_managed_ns or None)
+    except ValueError as ex:
+        loggers.console.error(str(ex))
+        sys.exit(1)
+
+    # verifier and planner are imported here to keep startup fast
+    if plan:
+        from fcrepo_verify.planner import FedoraImportExportPlanner
+        planner = FedoraImportExportPlanner(config, loggers, sample)
+        planner.execute()
+    else:
+        # Create and execute verifier logic
+        from fcrepo_verify.verifier import FedoraImportExportVerifier
+        verifier = FedoraImportExportVerifier(config, loggers)
+        verifier.execute()
 
 
 if __name__ == "__main__":
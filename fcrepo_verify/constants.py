@@ -9,14 +9,47 @@ EXT_MAP = {"application/ld+json":   ".json",
            "text/turtle":           ".ttl",
            "application/x-turtle":  ".ttl"
            }
+LDP_NS = "http://www.w3.org/ns/ldp#"
+FEDORA_NS = "http://fedora.info/definitions/v4/repository#"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+PREMIS_NS = "http://www.loc.gov/premis/rdf/v1#"
+EBUCORE_NS = "http://www.ebu.ch/metadata/ontologies/ebucore/ebucore#"
+IANA_NS = "http://www.iana.org/assignments/relation/"
 LDP_NON_RDF_SOURCE = "http://www.w3.org/ns/ldp#NonRDFSource"
 LDP_CONTAINS = "http://www.w3.org/ns/ldp#contains"
+LDP_PREFER_CONTAINMENT = "http://www.w3.org/ns/ldp#PreferContainment"
+LDP_PREFER_MINIMAL_CONTAINER = \
+    "http://www.w3.org/ns/ldp#PreferMinimalContainer"
 FEDORA_HAS_VERSION = "http://fedora.info/definitions/v4/repository#hasVersion"
 FEDORA_HAS_VERSIONS = \
     "http://fedora.info/definitions/v4/repository#hasVersions"
+# triples that Fedora adds to resources and binary descriptions itself: any
+# predicate in these namespaces, the rdf:types in them or in LDP, and the
+# predicates listed below
+SERVER_MANAGED_NAMESPACES = (FEDORA_NS,)
+SERVER_MANAGED_PREDICATES = (
+    LDP_CONTAINS,
+    PREMIS_NS + "hasMessageDigest",
+    PREMIS_NS + "hasSize",
+    EBUCORE_NS + "filename",
+    EBUCORE_NS + "hasMimeType",
+    IANA_NS + "describedby"
+    )
+
+NTRIPLES = "application/n-triples"
 
 EXT_BINARY_INTERNAL = ".binary"
 EXT_BINARY_EXTERNAL = ".external"
 BAG_DATA_DIR = "/data"
 
 MINIMAL_HEADER = {"Prefer": "return=minimal"}
+# N-Triples is preferred, as it can be read much faster than Turtle
+RDF_ACCEPT = "application/n-triples, text/turtle;q=0.9"
+OMIT_CONTAINMENT_HEADER = {
+    "Prefer": 'return=representation; omit="{0}"'.format(
+        LDP_PREFER_CONTAINMENT)
+    }
+CONTAINMENT_ONLY_HEADER = {
+    "Prefer": 'return=representation; include="{0}"; omit="{1}"'.format(
+        LDP_PREFER_CONTAINMENT, LDP_PREFER_MINIMAL_CONTAINER)
+    }
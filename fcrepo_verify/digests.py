@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+import threading
+
+
+class DigestCache(object):
+    """Digests of external content, keyed by URL.
+
+    Each digest is stored with the ETag and Last-Modified validators of the
+    response it was computed from, so that it can be revalidated with a
+    conditional request instead of downloading the content again. If a path
+    is given, the cache is loaded from and saved to that file, so that it
+    is shared between runs.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.changed = False
+        self.lock = threading.Lock()
+        self.url_locks = {}
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+
+    def lock_for(self, url):
+        """Returns a lock to hold while fetching a URL, so that concurrent
+        verifications of the same content download it only once."""
+        with self.lock:
+            return self.url_locks.setdefault(url, threading.Lock())
+
+    def get(self, url):
+        """Returns the cached entry for a URL, a dict with the keys sha1,
+        etag and last_modified, or None."""
+        with self.lock:
+            return self.entries.get(url)
+
+    def conditional_headers(self, url):
+        """Returns the headers that revalidate the cached digest of a URL."""
+        entry = self.get(url)
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url, sha1, etag=None, last_modified=None):
+        """Caches the digest of a URL. Digests without validators cannot be
+        revalidated, so they are not cached."""
+        if etag is None and last_modified is None:
+            return
+        with self.lock:
+            self.entries[url] = {"sha1": sha1, "etag": etag,
+                                 "last_modified": last_modified}
+            self.changed = True
+
+    def save(self):
+        """Writes the cache to its file, if it has one and has changed."""
+        with self.lock:
+            if self.path is None or not self.changed:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(temp, self.path)
+            self.changed = False
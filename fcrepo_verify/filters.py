@@ -0,0 +1,97 @@
+from .constants import LDP_CONTAINS, LDP_NS, RDF_TYPE, \
+    SERVER_MANAGED_NAMESPACES, SERVER_MANAGED_PREDICATES
+from .utils import is_binary_head
+
+
+class TripleFilter(object):
+    """A rule deciding whether a parsed triple is kept in the graph."""
+    def accepts(self, triple):
+        return True
+
+
+class FilterPipeline(TripleFilter):
+    """Keeps only the triples accepted by every filter in a list."""
+    def __init__(self, filters):
+        self.filters = filters
+
+    def accepts(self, triple):
+        for f in self.filters:
+            if not f.accepts(triple):
+                return False
+        return True
+
+
+class PredicateFilter(TripleFilter):
+    """Drops triples whose predicate is in a set of IRIs."""
+    def __init__(self, predicates):
+        self.predicates = set(str(p) for p in predicates)
+
+    def accepts(self, triple):
+        return str(triple[1]) not in self.predicates
+
+
+class ServerManagedFilter(TripleFilter):
+    """Drops the triples that Fedora manages itself.
+
+    Legacy exports leave these triples out, so they are recognized by name:
+    a triple is dropped if its predicate is in one of the namespaces or is
+    one of the predicates given, or if it is an rdf:type in one of the
+    namespaces or in LDP. Other LDP predicates, such as those that configure
+    a direct container, are kept.
+    """
+    def __init__(self, namespaces=SERVER_MANAGED_NAMESPACES,
+                 predicates=SERVER_MANAGED_PREDICATES):
+        self.namespaces = tuple(namespaces)
+        self.type_namespaces = self.namespaces + (LDP_NS,)
+        self.predicates = set(str(p) for p in predicates)
+
+    def accepts(self, triple):
+        s, p, o = [str(t) for t in triple]
+        if p in self.predicates or p.startswith(self.namespaces):
+            return False
+        elif p == RDF_TYPE and o.startswith(self.type_namespaces):
+            return False
+        return True
+
+
+class BinaryReferenceFilter(TripleFilter):
+    """Drops triples whose object is a binary in the repository."""
+    def __init__(self, config, cache_size=65536):
+        self.repobase = config.repobase
+        self.auth = config.auth
+        self.session = config.session
+        self.cache_size = cache_size
+        # binary status of recently seen objects, as many resources refer to
+        # the same binaries
+        self.cache = {}
+
+    def accepts(self, triple):
+        o = str(triple[2])
+        if not o.startswith(self.repobase):
+            return True
+        if o not in self.cache:
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[o] = is_binary_head(self.session.head(url=o,
+                                                             auth=self.auth))
+        return not self.cache[o]
+
+
+def build_triple_filter(config):
+    """Composes the filters that the configuration calls for, or returns
+    None if every triple should be kept."""
+    filters = []
+    if config.exclude_predicates:
+        filters.append(PredicateFilter(config.exclude_predicates))
+    # containment is verified against the directory listing
+    if config.containment_listing:
+        filters.append(PredicateFilter([LDP_CONTAINS]))
+    # legacy exports are compared without the server managed triples
+    if config.legacyMode and config.mode in ("import", "repository"):
+        filters.append(
+            ServerManagedFilter(config.server_managed_namespaces)
+            )
+    # binaries not included in export, so neither are references to them
+    if not config.bin:
+        filters.append(config.binary_filter)
+    return FilterPipeline(filters) if filters else None
@@ -1,6 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from csv import DictReader
 from os.path import basename, isfile
-from .utils import get_directory_contents, get_child_nodes
-from .utils import get_data_dir
+from .utils import get_directory_contents, fetch_child_nodes
+from .utils import get_data_dir, scan_directory
 
 
 class Walker:
@@ -20,14 +22,27 @@ class FcrepoWalker(Walker):
         self.auth = config.auth
         self.inbound = config.inbound
         self.predicates = config.predicates
+        self.session = config.session
+        # HEAD response of the most recently returned resource
+        self.head = None
 
     def __next__(self):
         if not self.to_check:
             raise StopIteration()
         else:
             current = self.to_check.pop()
-            children = get_child_nodes(current, self.predicates,
-                                       self.auth, self.logger)
+            try:
+                self.head, children = fetch_child_nodes(
+                    current, self.predicates, self.auth, self.logger,
+                    self.session
+                    )
+            except IOError as ex:
+                # skip the subtree, but return the node so that its failure
+                # is reported when it is verified
+                self.logger.error(
+                    "Error communicating with repository: {0}".format(ex)
+                    )
+                self.head, children = None, []
             if children:
                 self.to_check.extend(children)
             return current
@@ -55,3 +70,78 @@ class LocalWalker(Walker):
                 if children:
                     self.to_check.extend(children)
                 return None
+
+
+class ParallelLocalWalker(Walker):
+    """Walk serialized resources on disk, reading many directories at once.
+
+    On network filesystems each directory read is a slow round trip, so up
+    to workers directories are scanned concurrently on a thread pool. Only
+    files are returned, each carrying the size found by the scan.
+    """
+    def __init__(self, config, logger, workers):
+        Walker.__init__(self, get_data_dir(config), logger)
+        self.workers = workers
+        self.files = self._walk()
+
+    def _walk(self):
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            pending = {executor.submit(scan_directory, root)
+                       for root in self.to_check}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    directories, files = future.result()
+                    for directory in directories:
+                        pending.add(executor.submit(scan_directory,
+                                                    directory))
+                    for path in files:
+                        yield path
+        finally:
+            executor.shutdown(wait=False)
+
+    def __next__(self):
+        return next(self.files)
+
+
+class ListWalker(Walker):
+    """Walk the resources listed in a file.
+
+    The file is either a CSV report from an earlier verification, in which
+    case only the resources that failed verification are walked, or a list
+    of repository URIs or local paths, one per line.
+    """
+    def __init__(self, path, logger):
+        Walker.__init__(self, None, logger)
+        self.to_check = self._read(path)
+        self.head = None
+
+    def _read(self, path):
+        with open(path, "r", newline="") as f:
+            first = f.readline()
+            f.seek(0)
+            if "verified" in first and "original" in first:
+                for row in DictReader(f):
+                    if row["verified"] == "False":
+                        yield row["original"]
+            else:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        yield line
+
+    def __next__(self):
+        return next(self.to_check)
+
+
+def get_walker(config, logger):
+    """Returns the walker for the configured input or mode."""
+    if config.input_file is not None:
+        return ListWalker(config.input_file, logger)
+    elif config.mode in ("export", "repository"):
+        return FcrepoWalker(config, logger)
+    elif config.mode == "import":
+        if config.workers > 1:
+            return ParallelLocalWalker(config, logger, config.workers)
+        return LocalWalker(config, logger)
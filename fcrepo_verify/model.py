@@ -1,8 +1,8 @@
-import requests
-import sys
 from urllib.parse import urlparse
 from .constants import EXT_MAP, FEDORA_HAS_VERSIONS, FEDORA_HAS_VERSION, \
-    LDP_CONTAINS
+    LDP_CONTAINS, SERVER_MANAGED_NAMESPACES
+from .digests import DigestCache
+from .filters import BinaryReferenceFilter, build_triple_filter
 from yaml import load
 try:
     from yaml import CLoader as Loader
@@ -11,27 +11,71 @@ except ImportError:
 
 
 class Config():
-    """Object representing the options from configuration file and args."""
-    def __init__(self, configfile, auth, loggers, output_dir, verbose):
+    """Object representing the options from configuration file and args.
+
+    The configuration may also be given as a dict of the options that would
+    appear in the file. If no requests session is given, one is created so
+    that connections to the repository are pooled, applying the timeout
+    (in seconds), retries and hedging options to every request. With more
+    than one worker, or a max_rate in requests per second, the requests in
+    flight are limited adaptively to protect the repository. Digests of
+    external content are cached in the digest_cache file, if given. Invalid
+    options raise ValueError.
+    Predicates in the server_managed_namespaces are treated as managed by
+    Fedora when verifying a legacy export.
+    """
+    def __init__(self, configfile, auth, loggers, output_dir, verbose,
+                 workers=1, graph_threshold=0, containment_listing=False,
+                 exclude_predicates=(), session=None, input_file=None,
+                 size_only=False, timeout=60, retries=3, hedge=False,
+                 max_rate=None, digest_cache=None,
+                 server_managed_namespaces=None):
         console = loggers.console
-        console.info(
-            "Loading configuration options from {0}".format(configfile)
-            )
+        if isinstance(configfile, dict):
+            opts = configfile
+        else:
+            console.info(
+                "Loading configuration options from {0}".format(configfile)
+                )
+            with open(configfile, "r") as f:
+                yaml_data = f.read()
+            opts = load(yaml_data, Loader=Loader)
+
+        if session is None:
+            from .transport import CONNECT_TIMEOUT, ResilientSession
+            session = ResilientSession(
+                timeout=(min(CONNECT_TIMEOUT, timeout), timeout),
+                retries=retries, hedge=hedge, hedge_workers=2 * workers,
+                # the workers and the walker may all have requests in flight
+                max_concurrency=workers + 1 if workers > 1 else None,
+                max_rate=max_rate,
+                # one connection for every thread that may make requests:
+                # workers, the walker, hedges and target fetches
+                pool_size=max(10, 4 * workers + 1)
+                )
+        self.session = session
         self.auth = auth
         self.output_dir = output_dir
         self.verbose = verbose
+        self.workers = workers
+        self.graph_threshold = graph_threshold
+        self.containment_listing = containment_listing
+        self.exclude_predicates = list(exclude_predicates)
+        self.input_file = input_file
+        self.size_only = size_only
+        self.digest_cache = DigestCache(digest_cache)
+        if server_managed_namespaces is None:
+            server_managed_namespaces = SERVER_MANAGED_NAMESPACES
+        self.server_managed_namespaces = list(server_managed_namespaces)
 
         # initialize config defaults (will be overidden below if in config)
         self.bag = False
+        self.dir = None
         self.versions = False
         self.bin = False
+        self.legacyMode = False
         self.predicates = None
 
-        with open(configfile, "r") as f:
-            yaml_data = f.read()
-
-        opts = load(yaml_data, Loader=Loader)
-
         # log the key/value pairs loaded from configuration
         console.info("Loaded the following configuration options:")
         pad = max([len(k) for k in opts.keys()])
@@ -100,27 +144,45 @@ class Config():
             if self.lang in EXT_MAP:
                 self.ext = EXT_MAP[self.lang]
             else:
-                loggers.console.error(
+                raise ValueError(
                     "Unrecognized RDF serialization specified in config file!"
                     )
-                sys.exit(1)
+
+        # a target repository is compared with the source, through the map
+        if self.mode == "repository" and self.mapFrom is None:
+            raise ValueError(
+                "Repository mode requires a map from the source repository "
+                "to the target!"
+                )
 
         # split the repository URI into base and path components
         self.repopath = urlparse(self.repo).path
         self.repobase = self.repo[:-len(self.repopath)]
 
+        # compose the rules that drop triples as RDF is parsed; the binary
+        # check is shared with containment listings, along with its cache
+        self.binary_filter = None if self.bin else BinaryReferenceFilter(self)
+        self.triple_filter = build_triple_filter(self)
+
 
 class Repository():
-    """Object representing a live Fedora repository."""
-    def __init__(self, config, loggers):
+    """Object representing a live Fedora repository.
+
+    This is the configured repository, unless the URI of another is given.
+    """
+    def __init__(self, config, loggers, uri=None):
         self.auth = config.auth
-        self.path = config.repopath
-        self.base = config.repobase
+        self.session = config.session
+        if uri is None:
+            uri = config.repo
+        self.path = urlparse(uri).path
+        self.base = uri[:-len(self.path)] if self.path else uri
         self.root = self.base + self.path
 
     def is_reachable(self):
+        import requests
         try:
-            response = requests.head(self.root, auth=self.auth)
+            response = self.session.head(self.root, auth=self.auth)
             return response.status_code == 200
-        except requests.ConnectionError:
+        except (requests.ConnectionError, requests.Timeout):
             return False
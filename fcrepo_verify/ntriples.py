@@ -0,0 +1,177 @@
+"""A line-oriented N-Triples reader.
+
+Parsing N-Triples a line at a time with a regular expression is much faster
+than rdflib's general purpose parsers, and since every line stands alone a
+file can be split into byte ranges that are read independently.
+"""
+import io
+import os
+import re
+from rdflib import BNode, Graph, Literal, URIRef
+
+from .constants import NTRIPLES
+
+# serializations Fedora offers under other names than rdflib's parsers
+PARSER_ALIASES = {"text/plain": NTRIPLES,
+                  "application/x-turtle": "text/turtle",
+                  "text/rdf+n3": "text/n3"}
+# parsers that add each triple through Graph.add; the others (JSON-LD, N3)
+# write to the store directly
+STREAMING_PARSERS = ("text/turtle", "application/rdf+xml")
+
+TRIPLE = re.compile(
+    r'\s*(<[^>]*>|_:\S*[^\s.])'         # subject
+    r'\s*(<[^>]*>)'                     # predicate
+    r'\s*(<[^>]*>|_:\S*[^\s.]|'         # object: IRI, blank node or
+    r'"(?:[^"\\]|\\.)*"'                # literal, with optional
+    r'(?:@[a-zA-Z]+(?:-[a-zA-Z0-9]+)*|\^\^<[^>]*>)?)'  # language/datatype
+    r'\s*\.\s*(?:#.*)?$'
+    )
+ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f",
+           '"': '"', "'": "'", "\\": "\\"}
+
+
+class ParseError(ValueError):
+    pass
+
+
+def _unescape_match(match):
+    short, long_, char = match.groups()
+    if char is not None:
+        return ESCAPES.get(char, char)
+    return chr(int(short or long_, 16))
+
+
+def unescape(text):
+    """Resolves the escape sequences in an IRI or literal."""
+    if "\\" not in text:
+        return text
+    return ESCAPE.sub(_unescape_match, text)
+
+
+class TermReader(object):
+    """Turns the parts of N-Triples lines into rdflib terms.
+
+    Blank nodes keep their labels, so that they are consistent between
+    readers of different parts of the same document.
+    """
+    def term(self, text):
+        if text.startswith("<"):
+            return URIRef(unescape(text[1:-1]))
+        elif text.startswith("_:"):
+            return BNode(text[2:])
+        # literal: find the closing quote, then any language or datatype
+        end = text.rindex('"')
+        lexical = unescape(text[1:end])
+        suffix = text[end + 1:]
+        if suffix.startswith("@"):
+            return Literal(lexical, lang=suffix[1:])
+        elif suffix.startswith("^^"):
+            return Literal(lexical, datatype=URIRef(unescape(suffix[3:-1])))
+        return Literal(lexical)
+
+    def triple(self, line):
+        """Returns the triple on a line, or None for blank and comment
+        lines."""
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            return None
+        match = TRIPLE.match(stripped)
+        if match is None:
+            raise ParseError("Invalid N-Triples line: {0}".format(stripped))
+        s, p, o = match.groups()
+        return self.term(s), self.term(p), self.term(o)
+
+
+def iter_triples(lines):
+    """Generates the triples in an iterable of N-Triples lines."""
+    reader = TermReader()
+    for line in lines:
+        triple = reader.triple(line)
+        if triple is not None:
+            yield triple
+
+
+def read_ntriples(path, start=0, end=None):
+    """Generates the triples on the lines of a file that begin within the
+    byte range [start, end)."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        reader = TermReader()
+        position = start
+        for line in f:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            triple = reader.triple(line.decode("utf-8"))
+            if triple is not None:
+                yield triple
+
+
+def split_ranges(path, parts):
+    """Splits a file into at most parts byte ranges that start on line
+    boundaries, returned as a list of (start, end) tuples."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            offset = max(size * i // parts, bounds[-1])
+            if offset <= 0:
+                continue
+            elif offset >= size:
+                break
+            # move to the start of the line following offset
+            f.seek(offset - 1)
+            f.readline()
+            position = f.tell()
+            if position > bounds[-1] and position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class TripleSink(Graph):
+    """A graph that passes parsed triples to a callback instead of storing
+    them."""
+    def __init__(self, callback):
+        Graph.__init__(self)
+        self.callback = callback
+
+    def add(self, triple):
+        self.callback(triple)
+        return self
+
+    def addN(self, quads):
+        for s, p, o, c in quads:
+            self.add((s, p, o))
+        return self
+
+
+def parser_format(rdf_format):
+    """Returns the name of rdflib's parser for a serialization."""
+    return PARSER_ALIASES.get(rdf_format, rdf_format)
+
+
+def parse_triples(callback, rdf_format, **source):
+    """Parses RDF, passing each triple to callback instead of storing it.
+
+    N-Triples is read with the native reader; other serializations are
+    parsed by rdflib. Parsers that bypass Graph.add fill a graph first, which
+    is then read back. The source is given as location=path or data=text.
+    """
+    rdf_format = parser_format(rdf_format)
+    if rdf_format == NTRIPLES:
+        if "location" in source:
+            triples = read_ntriples(source["location"])
+        else:
+            # only "\n" ends a line: str.splitlines() would also split on
+            # characters that may appear unescaped in literals
+            triples = iter_triples(io.StringIO(source["data"], newline="\n"))
+        for triple in triples:
+            callback(triple)
+    elif rdf_format in STREAMING_PARSERS:
+        TripleSink(callback).parse(format=rdf_format, **source)
+    else:
+        for triple in Graph().parse(format=rdf_format, **source):
+            callback(triple)
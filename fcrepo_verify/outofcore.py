@@ -0,0 +1,358 @@
+"""Out-of-core comparison of RDF graphs too large to hold in memory.
+
+Both graphs are streamed to normalized N-Triples, sorted externally in runs
+on disk and then merge-compared line by line. Triples with blank nodes are
+set aside in a file of their own until the end, when they are read back and
+each blank node is labelled with a hash of its surroundings in the graph, so
+that isomorphic graphs produce identical lines. As that is done in memory,
+graphs with more than MAX_BNODE_TRIPLES such triples are not compared.
+"""
+import heapq
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
+from hashlib import sha1
+from rdflib import BNode, Literal
+
+from .constants import NTRIPLES
+from .ntriples import parse_triples, read_ntriples, split_ranges
+
+# number of triples sorted in memory before a run is written to disk
+SORT_CHUNK_LINES = 250000
+# number of triples with blank nodes that may be labelled in memory
+MAX_BNODE_TRIPLES = 1000000
+
+
+def term_to_nt(term):
+    """Returns the normalized N-Triples form of an rdflib term."""
+    if isinstance(term, BNode):
+        return "_:{0}".format(term)
+    elif isinstance(term, Literal):
+        encoded = '"{0}"'.format(
+            str(term).replace("\\", "\\\\").replace("\n", "\\n")
+            .replace("\r", "\\r").replace('"', '\\"')
+            )
+        if term.language:
+            return "{0}@{1}".format(encoded, term.language.lower())
+        elif term.datatype:
+            return "{0}^^<{1}>".format(encoded, term.datatype)
+        return encoded
+    else:
+        return "<{0}>".format(term)
+
+
+def triple_to_nt(triple):
+    """Returns a triple as a normalized N-Triples line."""
+    return "{0} {1} {2} .\n".format(*[term_to_nt(t) for t in triple])
+
+
+def has_bnode(triple):
+    return isinstance(triple[0], BNode) or isinstance(triple[2], BNode)
+
+
+def _digest(parts):
+    return sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _signature(arrow, edges, labels):
+    """Returns the sorted descriptions of a blank node's edges, naming
+    neighbouring blank nodes by their labels."""
+    return sorted("{0} {1} {2}".format(
+        arrow, p, labels[n] if isinstance(n, BNode) else n)
+        for p, n in edges)
+
+
+def _propagate(nodes, edges, reverse, arrow):
+    """Labels blank nodes from their edges, once every blank node that their
+    edges lead to is labelled. Nodes whose edges lead into a cycle are left
+    out, as are the nodes that depend on them."""
+    pending = dict((node, sum(1 for p, n in edges[node]
+                              if isinstance(n, BNode)))
+                   for node in nodes)
+    ready = [node for node in nodes if pending[node] == 0]
+    labels = {}
+    while ready:
+        node = ready.pop()
+        labels[node] = _digest(_signature(arrow, edges[node], labels))
+        for p, n in reverse[node]:
+            if isinstance(n, BNode):
+                pending[n] -= 1
+                if pending[n] == 0:
+                    ready.append(n)
+    return labels
+
+
+def bnode_labels(triples):
+    """Labels the blank nodes in a set of triples by their structure.
+
+    A blank node is first labelled with hashes of what its outgoing triples
+    lead to, and of what leads to it, computed in a single pass over each
+    blank node where its triples do not form a cycle. That tells the nodes of
+    trees and lists apart in linear time. The labels are then refined from
+    the labels of neighbouring blank nodes until that tells no more blank
+    nodes apart, which takes more than a round only where there are cycles.
+    The labels do not depend on how the blank nodes were named, so
+    isomorphic sets of triples are labelled the same way. Blank nodes that
+    still share a label are numbered, which gives the same triples whichever
+    way round they are numbered if, as is usual, they are interchangeable.
+    """
+    outgoing = defaultdict(list)
+    incoming = defaultdict(list)
+    for s, p, o in triples:
+        if isinstance(s, BNode):
+            outgoing[s].append(
+                (p, o if isinstance(o, BNode) else term_to_nt(o)))
+        if isinstance(o, BNode):
+            incoming[o].append(
+                (p, s if isinstance(s, BNode) else term_to_nt(s)))
+    nodes = set(outgoing) | set(incoming)
+
+    below = _propagate(nodes, outgoing, incoming, ">")
+    above = _propagate(nodes, incoming, outgoing, "<")
+    labels = dict((node, _digest([below.get(node, ""),
+                                  above.get(node, "")]))
+                  for node in nodes)
+    distinct = len(set(labels.values()))
+    while distinct < len(nodes):
+        refined = dict(
+            (node, _digest([labels[node]] +
+                           _signature(">", outgoing[node], labels) +
+                           _signature("<", incoming[node], labels)))
+            for node in nodes
+            )
+        if len(set(refined.values())) == distinct:
+            break
+        labels = refined
+        distinct = len(set(labels.values()))
+
+    tied = defaultdict(list)
+    for node in nodes:
+        tied[labels[node]].append(node)
+    for label, group in tied.items():
+        for i, node in enumerate(group):
+            labels[node] = "{0}{1}".format(label[:32], i)
+    return labels
+
+
+def relabel_bnodes(triples):
+    """Generates the triples with their blank nodes relabelled by their
+    structure."""
+    triples = set(triples)
+    labels = bnode_labels(triples)
+    for triple in triples:
+        yield tuple(BNode(labels[t]) if isinstance(t, BNode) else t
+                    for t in triple)
+
+
+class SortedTriples:
+    """Collects triples into sorted runs on disk and merges them.
+
+    Triples with blank nodes are written to a file of their own, as their
+    labels are only canonical for the whole set. At most max_bnode_triples
+    of them are accepted, as they are labelled in memory.
+    """
+    def __init__(self, chunk_size=SORT_CHUNK_LINES,
+                 max_bnode_triples=MAX_BNODE_TRIPLES):
+        self.chunk_size = chunk_size
+        self.max_bnode_triples = max_bnode_triples
+        self.buffer = []
+        self.runs = []
+        self.bnode_files = []
+        self.bnode_file = None
+        self.bnode_count = 0
+
+    def add_triple(self, triple):
+        if has_bnode(triple):
+            self.add_bnode_triple(triple)
+        else:
+            self.add(triple_to_nt(triple))
+
+    def add_bnode_triple(self, triple):
+        self.bnode_count += 1
+        self.check_bnode_count()
+        if self.bnode_file is None:
+            fd, path = tempfile.mkstemp(suffix=".nt")
+            self.bnode_file = os.fdopen(fd, "w", encoding="utf-8")
+            self.bnode_files.append(path)
+        self.bnode_file.write(triple_to_nt(triple))
+
+    def check_bnode_count(self):
+        """Raises ValueError, removing the files written so far, if there
+        are too many triples with blank nodes."""
+        if self.bnode_count > self.max_bnode_triples:
+            self.discard()
+            raise ValueError(
+                "Graph has more than {0} triples with blank nodes, too many "
+                "to compare on disk".format(self.max_bnode_triples)
+                )
+
+    def close_bnode_file(self):
+        """Closes the file of triples with blank nodes and returns the paths
+        of all such files."""
+        if self.bnode_file is not None:
+            self.bnode_file.close()
+            self.bnode_file = None
+        return self.bnode_files
+
+    def add(self, line):
+        self.buffer.append(line)
+        if len(self.buffer) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        self.buffer.sort()
+        fd, path = tempfile.mkstemp(suffix=".nt")
+        with os.fdopen(fd, "w", encoding="utf-8") as run:
+            run.writelines(self.buffer)
+        self.runs.append(path)
+        self.buffer = []
+
+    def discard(self):
+        """Removes the files written so far."""
+        for path in self.runs + self.close_bnode_file():
+            os.remove(path)
+        self.runs = []
+        self.bnode_files = []
+        self.buffer = []
+
+    def _relabel(self):
+        paths = self.close_bnode_file()
+        if not paths:
+            return
+        triples = []
+        for path in paths:
+            triples.extend(read_ntriples(path))
+            os.remove(path)
+        self.bnode_files = []
+        for triple in relabel_bnodes(triples):
+            self.add(triple_to_nt(triple))
+
+    def finish(self):
+        """Merges the runs into one deduplicated file and returns its path."""
+        self._relabel()
+        self._flush()
+        fd, path = tempfile.mkstemp(suffix=".nt")
+        files = [open(run, "r", encoding="utf-8") for run in self.runs]
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as dest:
+                previous = None
+                for line in heapq.merge(*files):
+                    if line != previous:
+                        dest.write(line)
+                        previous = line
+        finally:
+            for f in files:
+                f.close()
+            for run in self.runs:
+                os.remove(run)
+            self.runs = []
+        return path
+
+
+def sort_source(rdf_format, accepts=None, workers=1, **source):
+    """Parses RDF and returns the path of its sorted N-Triples.
+
+    Only triples for which accepts(triple) is True are kept, if given. The
+    source is passed on to Graph.parse, e.g. location=path or data=text.
+    N-Triples files are read with the native reader, using up to workers
+    processes.
+    """
+    if rdf_format == NTRIPLES and "location" in source:
+        return sort_ntriples(source["location"], accepts, workers)
+
+    sorter = SortedTriples()
+
+    def add(triple):
+        if accepts is None or accepts(triple):
+            sorter.add_triple(triple)
+
+    parse_triples(add, rdf_format, **source)
+    return sorter.finish()
+
+
+def _sort_range(path, start, end, accepts):
+    """Sorts the triples in one byte range of an N-Triples file.
+
+    Returns a tuple (path, bnode_paths, bnode_count): the triples with blank
+    nodes are left in files of their own, to be labelled together with those
+    of the other ranges.
+    """
+    sorter = SortedTriples()
+    for triple in read_ntriples(path, start, end):
+        if accepts is None or accepts(triple):
+            sorter.add_triple(triple)
+    bnode_paths = sorter.close_bnode_file()
+    sorter.bnode_files = []
+    return sorter.finish(), bnode_paths, sorter.bnode_count
+
+
+def sort_ntriples(path, accepts=None, workers=1):
+    """Sorts an N-Triples file with the native reader.
+
+    With more than one worker, the file is split into line ranges that are
+    read and sorted in separate processes, then merged.
+    """
+    ranges = split_ranges(path, workers)
+    if len(ranges) == 1:
+        results = [_sort_range(path, 0, None, accepts)]
+    else:
+        # verifications may run on threads, which are not safe to fork
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=context) as executor:
+            futures = [executor.submit(_sort_range, path, start, end,
+                                       accepts)
+                       for start, end in ranges]
+            results = [future.result() for future in futures]
+
+    if len(results) == 1 and not results[0][1]:
+        return results[0][0]
+    merger = SortedTriples()
+    for run, bnode_paths, bnode_count in results:
+        merger.runs.append(run)
+        merger.bnode_files.extend(bnode_paths)
+        merger.bnode_count += bnode_count
+    merger.check_bnode_count()
+    return merger.finish()
+
+
+def sort_graph(graph):
+    """Writes an in-memory graph to a sorted N-Triples file."""
+    sorter = SortedTriples()
+    for triple in graph:
+        sorter.add_triple(triple)
+    return sorter.finish()
+
+
+def compare_sorted(path1, path2):
+    """Merge-compares two sorted N-Triples files.
+
+    Returns a tuple (common, missing, extra) counting the triples found in
+    both files, only in the first and only in the second.
+    """
+    common = missing = extra = 0
+    with open(path1, "r", encoding="utf-8") as first, \
+            open(path2, "r", encoding="utf-8") as second:
+        line1, line2 = next(first, None), next(second, None)
+        while line1 is not None and line2 is not None:
+            if line1 == line2:
+                common += 1
+                line1, line2 = next(first, None), next(second, None)
+            elif line1 < line2:
+                missing += 1
+                line1 = next(first, None)
+            else:
+                extra += 1
+                line2 = next(second, None)
+        while line1 is not None:
+            missing += 1
+            line1 = next(first, None)
+        while line2 is not None:
+            extra += 1
+            line2 = next(second, None)
+
+    return common, missing, extra
@@ -0,0 +1,193 @@
+import datetime
+import sys
+import time
+
+from .constants import EXT_BINARY_INTERNAL, EXT_BINARY_EXTERNAL
+from .iterators import get_walker
+from .model import Repository
+from .utils import get_file_size, is_binary_head
+
+
+class FedoraImportExportPlanner:
+    """Inventories a verification run and estimates how long it will take.
+
+    Only the walkers are run over the full tree; a small sample of resources
+    is then fully verified to measure the cost of a verification.
+    """
+    def __init__(self, config, loggers, sample_size=10):
+        self.config = config
+        self.loggers = loggers
+        self.sample_size = sample_size
+
+        self.rdf_count = 0
+        self.binary_count = 0
+        self.binary_bytes = 0
+        self.external_count = 0
+        self.skipped_count = 0
+        self.samples = {"rdf": [], "binary": [], "external": []}
+
+    def classify_fedora(self, uri, head):
+        """Returns a tuple (type, size) for a resource in the repository."""
+        config = self.config
+        if uri.endswith("/fcr:metadata"):
+            return ("rdf", 0) if config.bin else (None, 0)
+        elif is_binary_head(head):
+            if not config.bin:
+                return None, 0
+            elif head.status_code == 307:
+                # the length of a redirect is not that of the content
+                return ("external", 0) if config.external else (None, 0)
+            return "binary", int(head.headers.get("Content-Length", 0))
+        else:
+            return "rdf", 0
+
+    def classify_local(self, path):
+        """Returns a tuple (type, size) for a resource serialized to disk."""
+        config = self.config
+        if path.endswith(EXT_BINARY_INTERNAL) or \
+                path.endswith(EXT_BINARY_EXTERNAL):
+            if not config.bin:
+                return None, 0
+            elif path.endswith(EXT_BINARY_EXTERNAL):
+                # the file holds a reference, not the content
+                return ("external", 0) if config.external else (None, 0)
+            return "binary", get_file_size(path)
+        elif path.endswith(config.ext):
+            return "rdf", 0
+        else:
+            return None, 0
+
+    def inventory(self):
+        """Walks the tree, counting resources, binaries, their total bytes
+        and external binaries."""
+        config = self.config
+        logger = self.loggers.file_only
+
+        tree = get_walker(config, logger)
+
+        for filepath in tree:
+            if filepath is None:
+                continue
+            if filepath.startswith(config.repobase):
+                head = tree.head
+                # walkers reading from a file do not fetch the resource
+                try:
+                    if head is None:
+                        head = config.session.head(filepath, auth=config.auth)
+                except IOError as ex:
+                    logger.warn("Cannot read {0}: {1}".format(filepath, ex))
+                    restype, size = None, 0
+                else:
+                    restype, size = self.classify_fedora(filepath, head)
+            else:
+                restype, size = self.classify_local(filepath)
+
+            if restype is None:
+                self.skipped_count += 1
+                continue
+            elif restype == "binary":
+                self.binary_count += 1
+                self.binary_bytes += size
+            elif restype == "external":
+                self.external_count += 1
+            else:
+                self.rdf_count += 1
+
+            if len(self.samples[restype]) < self.sample_size:
+                self.samples[restype].append((filepath, size))
+
+    def time_samples(self, restype):
+        """Fully verifies the sampled resources of one type.
+
+        Returns a tuple (seconds, bytes) totalled over the sample.
+        """
+        # the verifier pulls in rdflib, so only import it when sampling
+        from .verifier import FedoraImportExportVerifier
+        verifier = FedoraImportExportVerifier(self.config, self.loggers)
+        elapsed = 0.0
+        size_total = 0
+        for filepath, size in self.samples[restype]:
+            start = time.perf_counter()
+            try:
+                verifier.verify_resource(filepath)
+            except Exception as ex:
+                self.loggers.file_only.warn(
+                    "Sample {0} could not be verified: {1}".format(
+                        filepath, ex)
+                    )
+            elapsed += time.perf_counter() - start
+            size_total += size
+        return elapsed, size_total
+
+    def estimate(self):
+        """Projects the verification time in seconds for a single worker."""
+        estimate = 0.0
+
+        # the sizes of rdf resources and external content are not known
+        for restype, count in (("rdf", self.rdf_count),
+                               ("external", self.external_count)):
+            sample = len(self.samples[restype])
+            if sample:
+                elapsed, _ = self.time_samples(restype)
+                estimate += elapsed / sample * count
+
+        binary_sample = len(self.samples["binary"])
+        if binary_sample:
+            elapsed, size = self.time_samples("binary")
+            # binary verification is dominated by hashing, so scale by bytes
+            if size and self.binary_bytes:
+                estimate += elapsed / size * self.binary_bytes
+            else:
+                estimate += elapsed / binary_sample * self.binary_count
+
+        return estimate
+
+    def execute(self):
+        """Executes the planning process."""
+        config = self.config
+        console = self.loggers.console
+
+        # Check the repository connection
+        repo = Repository(config, self.loggers)
+        console.info("Testing connection to {0}...".format(repo.base))
+        if repo.is_reachable():
+            console.info("Connection successful.")
+        else:
+            console.error(
+                "Connection to {0} failed. Exiting.".format(repo.base)
+                )
+            sys.exit(1)
+
+        console.info(
+            "Planning verification of Fedora 4 {0}".format(config.mode)
+            )
+        start = time.perf_counter()
+        self.inventory()
+        walk_time = time.perf_counter() - start
+
+        console.info(
+            "Found {0} resources: rdf = {1}, binaries = {2} ({3} bytes), "
+            "external = {4}, skipped = {5}".format(
+                self.rdf_count + self.binary_count + self.external_count,
+                self.rdf_count, self.binary_count, self.binary_bytes,
+                self.external_count, self.skipped_count)
+            )
+        console.info("Inventory took {0}".format(format_duration(walk_time)))
+
+        console.info(
+            "Timing a sample of {0} rdf, {1} binary and {2} external "
+            "resources...".format(
+                len(self.samples["rdf"]), len(self.samples["binary"]),
+                len(self.samples["external"]))
+            )
+        verify_time = self.estimate() / max(config.workers, 1)
+
+        console.info(
+            "Estimated run time with {0} worker(s): {1}".format(
+                config.workers, format_duration(walk_time + verify_time))
+            )
+
+
+def format_duration(seconds):
+    """Formats a number of seconds as H:MM:SS."""
+    return str(datetime.timedelta(seconds=int(round(seconds))))
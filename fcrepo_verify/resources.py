@@ -2,15 +2,20 @@ from __future__ import print_function
 from hashlib import sha1
 from rdflib import Graph
 import re
-import requests
-import sys
 import os
-import ssl
+import tempfile
 from urllib.parse import urlparse, quote
-from urllib.request import urlopen
 from .constants import EXT_BINARY_INTERNAL, EXT_BINARY_EXTERNAL, \
-    LDP_NON_RDF_SOURCE, MINIMAL_HEADER
-from .utils import get_data_dir, replace_strings_in_file
+    LDP_CONTAINS, LDP_NON_RDF_SOURCE, NTRIPLES, OMIT_CONTAINMENT_HEADER, \
+    CONTAINMENT_ONLY_HEADER, RDF_ACCEPT
+from .ntriples import parse_triples, parser_format
+from .transport import ResilientSession
+from .utils import get_data_dir, get_child_name, \
+    get_directory_child_names, get_file_size, get_rdf_format, map_uri, \
+    replace_strings_in_file
+
+# binaries are read in large blocks, which hash much faster over the network
+HASH_CHUNK_SIZE = 1024 * 1024
 
 
 class Resource(object):
@@ -21,25 +26,128 @@ class Resource(object):
         self.logger = logger
         self.console = console
         self.data_dir = get_data_dir(config)
+        self.graph = None
+        # graphs above the threshold are kept on disk as sorted N-Triples
+        self.large = False
+        self.triples_path = None
+        # binary size in bytes, if known, and its lazily computed digest
+        self.size = None
+        self._sha1 = None
 
     def fetch_headers(self, origpath, auth):
-        return requests.head(url=origpath, auth=auth)
+        return self.config.session.head(url=origpath, auth=auth)
+
+    @property
+    def sha1(self):
+        """The SHA-1 digest of a binary, computed on first use so that a
+        size mismatch can be reported without hashing."""
+        if self._sha1 is None:
+            self._sha1 = self.compute_sha1()
+        return self._sha1
+
+    def compute_sha1(self):
+        return ""
+
+    def is_large(self, size):
+        threshold = self.config.graph_threshold
+        return bool(threshold) and size > threshold
+
+    def sorted_triples(self):
+        """Returns the path of the graph as sorted N-Triples on disk."""
+        if self.triples_path is None:
+            from .outofcore import sort_graph
+            self.triples_path = sort_graph(self.graph)
+        return self.triples_path
+
+    def parse_graph(self, rdf_format, **source):
+        """Parses RDF into a graph, dropping the triples rejected by the
+        configured filters as they are parsed.
+
+        Large graphs are streamed to sorted N-Triples on disk instead.
+        """
+        triple_filter = self.config.triple_filter
+        if self.large:
+            from .outofcore import sort_source
+            accepts = triple_filter.accepts if triple_filter else None
+            self.triples_path = sort_source(rdf_format, accepts=accepts,
+                                            workers=self.config.workers,
+                                            **source)
+        elif triple_filter is not None or rdf_format == NTRIPLES:
+            # parse_triples also filters formats whose parsers bypass add()
+            graph = FilteredGraph(triple_filter) if triple_filter else Graph()
+            parse_triples(graph.add, rdf_format, **source)
+            self.graph = graph
+        else:
+            self.graph = Graph().parse(format=parser_format(rdf_format),
+                                       **source)
+
+    def close(self):
+        """Releases the graph and removes any temporary files holding it."""
+        self.graph = None
+        if self.triples_path is not None and \
+                os.path.exists(self.triples_path):
+            os.remove(self.triples_path)
+        self.triples_path = None
+
+    def _spool_response(self, response):
+        """Reads a streamed response body.
+
+        Returns a tuple (data, path): the body as bytes if it is within the
+        graph size threshold, otherwise the path of a temp file holding it.
+        """
+        data = bytearray()
+        chunks = response.iter_content(chunk_size=65536)
+        for chunk in chunks:
+            data.extend(chunk)
+            if self.is_large(len(data)):
+                fd, path = tempfile.mkstemp()
+                with os.fdopen(fd, "wb") as spool:
+                    spool.write(data)
+                    for chunk in chunks:
+                        spool.write(chunk)
+                return None, path
+        return bytes(data), None
 
     def _calculate_sha1(self, stream):
+        return self._calculate_sha1_from_chunks(
+            iter(lambda: stream.read(HASH_CHUNK_SIZE), b"")
+            )
+
+    def _calculate_sha1_from_chunks(self, chunks):
         sh = sha1()
-        while True:
-            data = stream.read(8192)
-            if not data:
-                break
+        for data in chunks:
             sh.update(data)
         return sh.hexdigest()
 
 
+class FilteredGraph(Graph):
+    """A graph that drops triples rejected by a filter before they reach
+    the store."""
+    def __init__(self, triple_filter):
+        Graph.__init__(self)
+        self.triple_filter = triple_filter
+
+    def add(self, triple):
+        if self.triple_filter.accepts(triple):
+            Graph.add(self, triple)
+        return self
+
+    def addN(self, quads):
+        for s, p, o, c in quads:
+            self.add((s, p, o))
+        return self
+
+
 class FedoraResource(Resource):
-    """Properties and methods for a resource in a Fedora repository."""
-    def __init__(self, inputpath, config, logger, console):
+    """Properties and methods for a resource in a Fedora repository.
+
+    When comparing two repositories, the URIs of the source repository are
+    mapped onto the target in the RDF of resources created with map_uris.
+    """
+    def __init__(self, inputpath, config, logger, console, map_uris=False):
         Resource.__init__(self, inputpath, config, logger, console)
         self.location = "fedora"
+        self.map_uris = map_uris
         self.relpath = urlparse(self.origpath).path.rstrip("/")
         head_response = self.fetch_headers(self.origpath, self.config.auth)
 
@@ -64,63 +172,124 @@ class FedoraResource(Resource):
         elif head_response.status_code in [401, 403, 404, 405]:
             self.is_reachable = False
             self.type = "unknown"
+            self.destpath = ""
+            return
         else:
-            self.console.error("Unexpected response from Fedora")
-            sys.exit(1)
+            # a server error that persisted through retries fails only
+            # this resource
+            head_response.raise_for_status()
+            raise IOError("Unexpected response from Fedora: {0}".format(
+                head_response.status_code))
 
         # analyze resources that can be reached
         if self.is_binary():
             self.type = "binary"
             self.metadata = self.origpath + "/fcr:metadata"
+            # the length of a redirect is not that of the external content
+            if not self.external and "Content-Length" in self.headers:
+                self.size = int(self.headers["Content-Length"])
 
             if self.external:
-                content_type = self.headers["Content-Type"]
-                p = re.compile('.*url=\"(.*)\"')
-                url = p.match(content_type).group(1)
-                self.sha1 = self._calculate_sha1_from_uri(url)
-            else:
-                self.sha1 = self.lookup_sha1()
-
-            if self.external:
-                self.destpath = quote(
-                    (self.data_dir + self.relpath + EXT_BINARY_EXTERNAL)
-                    )
+                self.destpath = self._resolve_dest_path(EXT_BINARY_EXTERNAL)
             else:
-                self.destpath = quote(
-                    (self.data_dir + self.relpath + EXT_BINARY_INTERNAL)
-                    )
+                self.destpath = self._resolve_dest_path(EXT_BINARY_INTERNAL)
         else:
             self.type = "rdf"
-            self.destpath = quote(
-                (self.data_dir + self.relpath + self.config.ext)
-                )
-            response = requests.get(self.origpath, auth=self.config.auth)
-            minimal_resp = requests.get(
-                self.origpath, auth=self.config.auth, headers=MINIMAL_HEADER
+            self.destpath = self._resolve_dest_path(self.config.ext)
+            headers = {"Accept": RDF_ACCEPT}
+            # containment is verified separately from the directory listing
+            if self.config.containment_listing:
+                headers.update(OMIT_CONTAINMENT_HEADER)
+            response = self.config.session.get(
+                self.origpath, auth=self.config.auth, headers=headers,
+                stream=True
                 )
-            if response.status_code == 200 and minimal_resp.status_code == 200:
-                self.graph = Graph().parse(
-                    data=response.text, format="text/turtle"
-                    )
-                self.minimal = Graph().parse(
-                    data=minimal_resp.text, format="text/turtle"
-                    )
-                self.server_managed = self.graph - self.minimal
-            else:
+            if response.status_code != 200:
                 self.console.error("Cannot verify RDF resource!")
+                return
+
+            rdf_format = get_rdf_format(response)
+            data, spool = self._spool_response(response)
+            if spool is not None:
+                self.large = True
+                if self.map_uris:
+                    mapped = replace_strings_in_file(
+                        spool, self.config.mapFrom, self.config.mapTo
+                        )
+                    os.remove(spool)
+                    spool = mapped
+                try:
+                    self.parse_graph(rdf_format, location=spool)
+                finally:
+                    os.remove(spool)
+            else:
+                data = data.decode(response.encoding or "utf-8")
+                if self.map_uris:
+                    data = data.replace(self.config.mapFrom,
+                                        self.config.mapTo)
+                self.parse_graph(rdf_format, data=data)
+
+    def _resolve_dest_path(self, suffix):
+        if self.config.mode == "repository":
+            return map_uri(self.origpath, self.config.mapFrom,
+                           self.config.mapTo)
+        return quote(self.data_dir + self.relpath + suffix)
+
+    def child_names(self):
+        """Returns the names of the resources this container contains.
+
+        Only the containment triples are requested, and they are streamed
+        so that only the names are held in memory. Binaries are left out if
+        they are not exported.
+        """
+        names = set()
+        subject = self.origpath.rstrip("/")
+        binary_filter = self.config.binary_filter
+
+        def collect(triple):
+            s, p, o = triple
+            if str(p) == LDP_CONTAINS and str(s).rstrip("/") == subject:
+                if binary_filter is None or binary_filter.accepts(triple):
+                    names.add(get_child_name(str(o)))
+
+        headers = {"Accept": RDF_ACCEPT}
+        headers.update(CONTAINMENT_ONLY_HEADER)
+        response = self.config.session.get(
+            self.origpath, auth=self.config.auth, headers=headers,
+            stream=True
+            )
+        if response.status_code != 200:
+            response.close()
+            raise IOError("Cannot list the children of {0}: {1}".format(
+                self.origpath, response.status_code))
+        rdf_format = get_rdf_format(response)
+        data, spool = self._spool_response(response)
+        if spool is None:
+            parse_triples(collect, rdf_format,
+                          data=data.decode(response.encoding or "utf-8"))
+        else:
+            try:
+                parse_triples(collect, rdf_format, location=spool)
+            finally:
+                os.remove(spool)
+        return names
 
     def is_binary(self):
         return self.ldp_type == LDP_NON_RDF_SOURCE
 
-    def filter_binary_refs(self):
-        for (s, p, o) in self.graph:
-            if o.startswith(self.config.repobase) and \
-                    FedoraResource(o, self.config, self.logger).is_binary():
-                self.graph.remove((s, p, o))
+    def compute_sha1(self):
+        if self.external:
+            content_type = self.headers["Content-Type"]
+            p = re.compile('.*url=\"(.*)\"')
+            url = p.match(content_type).group(1)
+            return self._calculate_sha1_from_uri(url)
+        else:
+            return self.lookup_sha1()
 
     def lookup_sha1(self):
         result = ""
-        response = requests.get(self.metadata, auth=self.config.auth)
+        response = self.config.session.get(self.metadata,
+                                           auth=self.config.auth)
         if response.status_code == 200:
             m = re.search(
                 r"premis:hasMessageDigest[\s]+<urn:sha1:(.+?)>", response.text
@@ -130,9 +299,36 @@ class FedoraResource(Resource):
         return result
 
     def _calculate_sha1_from_uri(self, uri):
-        gc_context = ssl.SSLContext(ssl.PROTOCOL_TLSv1)
-        with urlopen(uri, context=gc_context) as u:
-            return self._calculate_sha1(u)
+        """Hashes external content, streaming it through the session.
+
+        A cached digest is revalidated with a conditional request, and the
+        content is only downloaded again if it has changed.
+        """
+        cache = self.config.digest_cache
+        session = self.config.session
+        # the content is not served by the repository, so its requests
+        # should neither be held back by nor skew the repository's limits
+        options = {}
+        if isinstance(session, ResilientSession):
+            options["limit"] = False
+        with cache.lock_for(uri):
+            response = session.get(
+                uri, headers=cache.conditional_headers(uri), stream=True,
+                **options
+                )
+            try:
+                entry = cache.get(uri)
+                if response.status_code == 304 and entry is not None:
+                    return entry["sha1"]
+                response.raise_for_status()
+                digest = self._calculate_sha1_from_chunks(
+                    response.iter_content(chunk_size=HASH_CHUNK_SIZE)
+                    )
+                cache.put(uri, digest, response.headers.get("ETag"),
+                          response.headers.get("Last-Modified"))
+                return digest
+            finally:
+                response.close()
 
 
 class LocalResource(Resource):
@@ -157,7 +353,12 @@ class LocalResource(Resource):
                 self.destpath = self._resolve_dest_path(EXT_BINARY_EXTERNAL)
             else:
                 self.destpath = self._resolve_dest_path(EXT_BINARY_INTERNAL)
-            self.sha1 = self._calculate_sha1_from_file(self.origpath)
+            if not self.external:
+                try:
+                    self.size = get_file_size(self.origpath)
+                except OSError:
+                    # a missing file is reported when it is checksummed
+                    pass
         elif self.origpath.startswith(self.data_dir) and \
                 self.origpath.endswith(config.ext):
             self.type = "rdf"
@@ -171,9 +372,12 @@ class LocalResource(Resource):
                                                         self.mapfrom,
                                                         self.mapto)
 
-            self.graph = Graph().parse(
-                location=localfilepath, format=config.lang
-                )
+            # sizes found while listing only apply to the unmapped file
+            if self.config.mapFrom is None:
+                self.large = self.is_large(get_file_size(localfilepath))
+            else:
+                self.large = self.is_large(os.path.getsize(localfilepath))
+            self.parse_graph(config.lang, location=localfilepath)
 
             if self.config.mapFrom is not None:
                 os.remove(localfilepath)
@@ -197,6 +401,16 @@ class LocalResource(Resource):
             desturlinfo = urlparse(self.config.repo)
             return self._get_base_uri(desturlinfo) + relative_path
 
+    def child_names(self):
+        """Returns the names of the resources serialized in the directory
+        that holds this container's children, leaving out binaries if they
+        are not exported."""
+        directory = self.origpath[:-len(self.config.ext)]
+        if not os.path.isdir(directory):
+            return set()
+        return get_directory_child_names(directory, self.config.ext,
+                                         self.config.bin)
+
     def _get_base_uri(self, urlinfo):
         return urlinfo.scheme + "://" + urlinfo.netloc
 
@@ -207,6 +421,9 @@ class LocalResource(Resource):
         else:
             return False
 
+    def compute_sha1(self):
+        return self._calculate_sha1_from_file(self.origpath)
+
     def _calculate_sha1_from_file(self, file_path):
         with open(file_path, "rb") as f:
             return self._calculate_sha1(f)
@@ -0,0 +1,28 @@
+class VerificationResult(object):
+    """The outcome of verifying one resource against its counterpart.
+
+    Only the paths and the verdict are kept, so that results can be held or
+    queued in large numbers without the resources and graphs they came from.
+    """
+    __slots__ = ("type", "location", "relpath", "original", "destination",
+                 "verified", "verification")
+
+    def __init__(self, type, location, relpath, original, destination,
+                 verified, verification):
+        self.type = type
+        self.location = location
+        self.relpath = relpath
+        self.original = original
+        self.destination = destination
+        self.verified = verified
+        self.verification = verification
+
+    @classmethod
+    def from_resource(cls, resource, verified, verification):
+        return cls(resource.type, getattr(resource, "location", "unknown"),
+                   resource.relpath, resource.origpath, resource.destpath,
+                   verified, verification)
+
+    def __repr__(self):
+        return "<VerificationResult {0} {1}: {2}>".format(
+            self.type, self.original, self.verification)
@@ -0,0 +1,307 @@
+"""The HTTP transport used to talk to the repository.
+
+Every request is given connect and read timeouts, so that a stalled response
+cannot stop a run. Idempotent requests (HEAD and GET) are retried after
+connection errors, timeouts and transient server errors, waiting a jittered,
+exponentially growing delay between attempts. Optionally, a request that is
+slower than most recent requests is hedged: a duplicate is sent and whichever
+response arrives first is used.
+
+To protect the repository, the number of requests in flight can be limited
+adaptively: the limit grows while response times stay flat and shrinks when
+they rise, requests time out or are refused, or the server answers 429 or 503.
+A ceiling on the request rate can also be set. Time spent waiting for the
+limiter is not counted when deciding whether to hedge a request.
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+import requests
+
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+RETRY_STATUSES = (500, 502, 503, 504)
+OVERLOAD_STATUSES = (429, 503)
+# percentile of recent request durations after which a request is hedged
+HEDGE_PERCENTILE = 0.95
+
+
+class LatencyTracker(object):
+    """Keeps the durations of recent requests to estimate percentiles."""
+    def __init__(self, size=500, minimum=20):
+        self.samples = deque(maxlen=size)
+        self.minimum = minimum
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        """Returns the given percentile of the recorded durations, or None
+        until enough requests have been recorded."""
+        with self.lock:
+            if len(self.samples) < self.minimum:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class ConcurrencyLimiter(object):
+    """Limits the requests in flight using additive increase, multiplicative
+    decrease (AIMD).
+
+    Each response that arrives within tolerance times the long-term average
+    response time raises the limit by 1/limit, or about one per round of
+    requests. A slower response, or a 429 or 503 status, multiplies the limit
+    by backoff_ratio, at most once per average response time. If max_rate is
+    given, requests are also spaced to at most max_rate per second.
+    """
+    def __init__(self, max_limit, min_limit=1, initial_limit=1,
+                 tolerance=2.0, backoff_ratio=0.7, max_rate=None):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial_limit)
+        self.tolerance = tolerance
+        self.backoff_ratio = backoff_ratio
+        self.interval = 1.0 / max_rate if max_rate else 0
+        self.in_flight = 0
+        # short and long-term moving averages of response times
+        self.recent_latency = None
+        self.baseline_latency = None
+        self.last_decrease = 0
+        self.next_start = 0
+        self.condition = threading.Condition()
+
+    @property
+    def current_limit(self):
+        return max(self.min_limit, int(self.limit))
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        with self.condition:
+            while self.in_flight >= self.current_limit:
+                self.condition.wait()
+            self.in_flight += 1
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def has_capacity(self):
+        """Returns whether a request could be sent without waiting."""
+        with self.condition:
+            return self.in_flight < self.current_limit and \
+                self.next_start <= time.monotonic()
+
+    def release(self, latency, status_code=None):
+        """Records the outcome of a request and adjusts the limit. A latency
+        of None means that the request failed without a response."""
+        with self.condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self._record(latency)
+            if self._overloaded(latency, status_code):
+                now = time.monotonic()
+                if now - self.last_decrease > (self.recent_latency or 0):
+                    self.limit = max(self.min_limit,
+                                     self.limit * self.backoff_ratio)
+                    self.last_decrease = now
+            elif latency is not None and \
+                    self.in_flight + 1 >= self.current_limit:
+                # only grow a limit that is being used
+                self.limit = min(self.max_limit,
+                                 self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def _record(self, latency):
+        if self.baseline_latency is None:
+            self.recent_latency = self.baseline_latency = latency
+        else:
+            self.recent_latency += 0.2 * (latency - self.recent_latency)
+            self.baseline_latency += 0.01 * (latency -
+                                             self.baseline_latency)
+
+    def _overloaded(self, latency, status_code):
+        if status_code in OVERLOAD_STATUSES:
+            return True
+        return latency is not None and \
+            self.recent_latency > self.tolerance * self.baseline_latency
+
+
+def _discard(future):
+    """Closes the response of a hedged request that lost the race."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class ResilientSession(requests.Session):
+    """A requests session that applies timeouts, retries, hedging and
+    concurrency limits.
+
+    The limiter is only used if max_concurrency or max_rate is given. Up to
+    pool_size connections are kept open to each host.
+    """
+    __attrs__ = requests.Session.__attrs__ + [
+        "timeout", "retries", "backoff", "hedge", "hedge_workers",
+        "max_concurrency", "max_rate"
+        ]
+
+    def __init__(self, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=3,
+                 backoff=0.5, hedge=False, hedge_workers=8,
+                 max_concurrency=None, max_rate=None, pool_size=10):
+        requests.Session.__init__(self)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_workers = hedge_workers
+        self.max_concurrency = max_concurrency
+        self.max_rate = max_rate
+        self._init_state()
+
+    def _init_state(self):
+        self.limiter = None
+        if self.max_concurrency or self.max_rate:
+            self.limiter = ConcurrencyLimiter(
+                self.max_concurrency or self.hedge_workers,
+                max_rate=self.max_rate
+                )
+        self.latencies = LatencyTracker()
+        self.executor = None
+        self.executor_lock = threading.Lock()
+
+    def __setstate__(self, state):
+        # sessions are pickled when filters are sent to other processes
+        requests.Session.__setstate__(self, state)
+        self._init_state()
+
+    def request(self, method, url, limit=True, **kwargs):
+        """Sends a request. With limit=False, as for content stored outside
+        the repository, the request is not hedged, does not count against
+        the limiter and is not recorded in the latencies."""
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if not limit:
+            send = self._direct_request
+        elif method.upper() in IDEMPOTENT_METHODS:
+            send = self._hedged_request
+        else:
+            send = self._limited_request
+        if method.upper() not in IDEMPOTENT_METHODS:
+            return send(method, url, **kwargs)
+
+        attempt = 0
+        while True:
+            try:
+                response = send(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or \
+                        attempt >= self.retries:
+                    return response
+                response.close()
+            time.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    def backoff_delay(self, attempt):
+        """Returns a random delay of up to backoff * 2 ** attempt seconds."""
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def _direct_request(self, method, url, **kwargs):
+        return requests.Session.request(self, method, url, **kwargs)
+
+    def _timed_request(self, method, url, sent=None, **kwargs):
+        return self._limited_request(method, url, sent=sent, record=True,
+                                     **kwargs)
+
+    def _limited_request(self, method, url, sent=None, record=False,
+                         **kwargs):
+        """Sends a request once the limiter lets it through. The sent event,
+        if given, is set at that point, and the time taken from then on is
+        recorded in the latencies if record is true."""
+        if self.limiter is not None:
+            self.limiter.acquire()
+        if sent is not None:
+            sent.set()
+        start = time.perf_counter()
+        try:
+            response = requests.Session.request(self, method, url, **kwargs)
+        except requests.Timeout:
+            self._release(time.perf_counter() - start, 503)
+            raise
+        except requests.ConnectionError:
+            # refused or reset connections are a sign of overload too
+            self._release(None, 503)
+            raise
+        except Exception:
+            self._release(None)
+            raise
+        latency = time.perf_counter() - start
+        self._release(latency, response.status_code)
+        if record:
+            self.latencies.record(latency)
+        return response
+
+    def _release(self, latency, status_code=None):
+        if self.limiter is not None:
+            self.limiter.release(latency, status_code)
+
+    def _get_executor(self):
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.hedge_workers
+                    )
+            return self.executor
+
+    def _hedged_request(self, method, url, **kwargs):
+        """Sends a request, and a duplicate if it is slower than the hedging
+        percentile of recent requests. Returns the first response."""
+        threshold = None
+        if self.hedge:
+            threshold = self.latencies.percentile(HEDGE_PERCENTILE)
+        if threshold is None:
+            return self._timed_request(method, url, **kwargs)
+
+        executor = self._get_executor()
+        sent = threading.Event()
+        first = executor.submit(self._timed_request, method, url, sent=sent,
+                                **kwargs)
+        # time spent waiting for the limiter does not count toward hedging
+        while not sent.wait(threshold) and not first.done():
+            pass
+        done, _ = wait([first], timeout=threshold)
+        if done or (self.limiter is not None and
+                    not self.limiter.has_capacity()):
+            # a duplicate would only wait for the limiter in turn
+            return first.result()
+
+        futures = [first, executor.submit(self._limited_request,
+                                          method, url, **kwargs)]
+        error = None
+        for future in as_completed(futures):
+            if future.exception() is None:
+                for other in futures:
+                    if other is not future:
+                        other.add_done_callback(_discard)
+                return future.result()
+            error = future.exception()
+        raise error
+
+    def close(self):
+        with self.executor_lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+        requests.Session.close(self)
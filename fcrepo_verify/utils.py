@@ -1,8 +1,7 @@
-from .constants import LDP_NON_RDF_SOURCE
-from rdflib import Graph, URIRef
-from rdflib.compare import graph_diff
-import requests
-import sys
+from .constants import EXT_BINARY_EXTERNAL, EXT_BINARY_INTERNAL, \
+    LDP_NON_RDF_SOURCE, NTRIPLES, RDF_ACCEPT
+from urllib.parse import unquote
+import os
 import fileinput
 import tempfile
 
@@ -12,32 +11,67 @@ except ImportError:
     from scandir import scandir
 
 
-def get_child_nodes(node, predicates, auth, logger):
+def get_child_nodes(node, predicates, auth, logger, session=None):
     """Get the children based on specified containment predicates."""
+    return fetch_child_nodes(node, predicates, auth, logger, session)[1]
+
+
+def fetch_child_nodes(node, predicates, auth, logger, session=None):
+    """Get the HEAD response of a node along with its children.
+
+    Raises IOError if the node cannot be read from the repository.
+    """
+    # rdflib and requests are slow to import, so defer until needed
+    from .ntriples import parse_triples
+    if session is None:
+        import requests as session
+
     # check the resource
-    head = requests.head(url=node, auth=auth)
+    head = session.head(url=node, auth=auth)
     if head.status_code in [200, 307]:
         # check if resource is binary and if so return metadata node
-        if hasattr(head, "links") and "type" in head.links and head.links[
-                "type"]["url"] == LDP_NON_RDF_SOURCE:
+        if is_binary_head(head):
             metadata = [node + "/fcr:metadata"]
-            return metadata
+            return head, metadata
         else:
             # get the node's graph
-            response = requests.get(url=node, auth=auth)
-            graph = Graph().parse(data=response.text, format="text/turtle")
+            response = session.get(url=node, auth=auth,
+                                   headers={"Accept": RDF_ACCEPT})
+            if response.status_code != 200:
+                raise IOError("Cannot read {0}: {1}".format(
+                    node, response.status_code))
+            wanted = set(predicates)
             children = []
+            seen = set()
+
             # get all the objects of containment triples
-            for cp in predicates:
-                predicate = URIRef(cp)
-                children.extend(
-                    [str(obj) for obj in graph.objects(subject=None,
-                                                       predicate=predicate)]
-                    )
-            return children
+            def collect(triple):
+                s, p, o = triple
+                if str(p) in wanted and str(o) not in seen:
+                    seen.add(str(o))
+                    children.append(str(o))
+
+            parse_triples(collect, get_rdf_format(response),
+                          data=response.content.decode(
+                              response.encoding or "utf-8"))
+            return head, children
     else:
-        logger.error("Error communicating with repository.")
-        sys.exit(1)
+        raise IOError("Cannot read {0}: {1}".format(node, head.status_code))
+
+
+def is_binary_head(head):
+    """Returns True if a HEAD response describes an LDP-NR (binary)."""
+    return hasattr(head, "links") and "type" in head.links and \
+        head.links["type"]["url"] == LDP_NON_RDF_SOURCE
+
+
+def get_rdf_format(response):
+    """Returns the RDF serialization of a response from its Content-Type,
+    which is Turtle unless N-Triples was returned."""
+    content_type = response.headers.get("Content-Type", "")
+    if content_type.split(";")[0].strip() == NTRIPLES:
+        return NTRIPLES
+    return "text/turtle"
 
 
 def get_directory_contents(localpath):
@@ -45,6 +79,78 @@ def get_directory_contents(localpath):
     return [p.path for p in scandir(localpath)]
 
 
+class ScannedPath(str):
+    """A file path that carries the size found when its directory was
+    scanned, so that the file need not be stat'ed again."""
+    def __new__(cls, path, size=None):
+        scanned = str.__new__(cls, path)
+        scanned.size = size
+        return scanned
+
+
+def scan_directory(localpath):
+    """Reads a directory in a single pass.
+
+    Returns a tuple (directories, files) of the paths of its subdirectories
+    and of its files, as ScannedPaths. Hidden entries are ignored.
+    """
+    directories = []
+    files = []
+    for entry in scandir(localpath):
+        if entry.name.startswith("."):
+            continue
+        elif entry.is_dir():
+            directories.append(entry.path)
+        else:
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                size = None
+            files.append(ScannedPath(entry.path, size))
+    return directories, files
+
+
+def get_file_size(path):
+    """Returns the size of a file, using the size found by a directory scan
+    if there is one."""
+    size = getattr(path, "size", None)
+    if size is None:
+        size = os.stat(path).st_size
+    return size
+
+
+def get_directory_child_names(localpath, rdf_ext, binaries=True):
+    """Get the names of the resources serialized in a directory, leaving
+    out binaries unless binaries is True."""
+    suffixes = [rdf_ext]
+    if binaries:
+        suffixes.extend([EXT_BINARY_INTERNAL, EXT_BINARY_EXTERNAL])
+    names = set()
+    for entry in scandir(localpath):
+        if entry.name.startswith(".") or not entry.is_file():
+            continue
+        for suffix in suffixes:
+            if entry.name.endswith(suffix):
+                name = unquote(entry.name[:-len(suffix)])
+                # fcr:metadata, fcr:versions etc. are not contained children
+                if not name.startswith("fcr:"):
+                    names.add(name)
+                break
+    return names
+
+
+def get_child_name(uri):
+    """Returns the last path segment of a child URI, unquoted."""
+    return unquote(uri.rstrip("/").rsplit("/", 1)[-1])
+
+
+def map_uri(uri, map_from, map_to):
+    """Maps a URI under map_from onto the same path under map_to."""
+    if uri.startswith(map_from):
+        return map_to + uri[len(map_from):]
+    return uri
+
+
 def get_data_dir(config):
     """Returns the root directory containing serialized fedora objects
     based on the configuration."""
@@ -65,6 +171,7 @@ def replace_strings_in_file(file, find_str, replace_str):
 
 def relaxed_compare(graph1, graph2):
     '''Compare two graphs, but treat untyped literals as strings'''
+    from rdflib.compare import graph_diff
     # if graphs are really identical, comparison is true
     if graph1 == graph2:
         return True
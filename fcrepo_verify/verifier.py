@@ -5,13 +5,15 @@ import sys
 import time
 import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, \
+    as_completed, wait
 from rdflib.compare import isomorphic
-from rdflib import Graph
-from bagit import Bag
 
 from .constants import EXT_BINARY_EXTERNAL
-from .iterators import FcrepoWalker, LocalWalker
+from .iterators import get_walker
 from .resources import FedoraResource, LocalResource
+from .results import VerificationResult
+from .utils import map_uri
 from .model import Repository
 
 
@@ -20,9 +22,13 @@ class FedoraImportExportVerifier:
     def __init__(self, config, loggers):
         self.config = config
         self.loggers = loggers
+        # fetches target resources in repository mode
+        self.fetcher = None
+        self.fetch_lock = threading.Lock()
 
     def verify_bag(self):
         """Verifies the structure of the bag"""
+        from bagit import Bag
         console = self.loggers.console
         console.info("Verifying bag...")
         bag = Bag(self.config.dir)
@@ -31,6 +37,265 @@ class FedoraImportExportVerifier:
         else:
             console.info("bag is invalid :(")
 
+    def verify_resource(self, filepath):
+        """Verifies a single resource against its counterpart.
+
+        Returns a VerificationResult, or None if the resource is excluded
+        from verification by the configuration. The graphs of both resources
+        are released as soon as they have been compared.
+        """
+        config = self.config
+        loggers = self.loggers
+        logger = loggers.file_only
+        console = loggers.console
+
+        # both sides are in repositories, so fetch them concurrently
+        if config.mode == "repository":
+            original, destination = self.fetch_pair(filepath)
+            if not original.is_reachable:
+                destination.close()
+                return VerificationResult.from_resource(
+                    original, False, "original not reachable"
+                    )
+        # path begins with repository base = fedora resource
+        elif filepath.startswith(config.repobase):
+            original = FedoraResource(filepath, config, logger, console)
+            if not original.is_reachable:
+                return VerificationResult.from_resource(
+                    original, False, "original not reachable"
+                    )
+        # path begins with local root dir = local resource
+        elif filepath.startswith(config.dir):
+            original = LocalResource(filepath, config, logger, console)
+        # any other path indicates an error
+        else:
+            raise ValueError(
+                "Resource in unexpected location: {0}".format(filepath)
+                )
+
+        # if binaries not included in export, skip binaries and fcr:metadata
+        # (references to binaries are filtered out as graphs are parsed)
+        if not config.bin:
+            if original.type == "binary" or \
+                    original.origpath.endswith("/fcr:metadata"):
+                original.close()
+                if config.mode == "repository":
+                    destination.close()
+                return None
+
+        if config.mode != "repository":
+            destination = None
+        try:
+            outcome = self.compare(original, destination)
+        finally:
+            original.close()
+        if outcome is not None:
+            return VerificationResult.from_resource(original, *outcome)
+
+    def fetch_pair(self, uri):
+        """Fetches a resource in the source repository and its counterpart
+        in the target repository at the same time.
+
+        Returns a tuple (original, destination).
+        """
+        config = self.config
+        logger = self.loggers.file_only
+        console = self.loggers.console
+        with self.fetch_lock:
+            if self.fetcher is None:
+                self.fetcher = ThreadPoolExecutor(
+                    max_workers=max(config.workers, 1)
+                    )
+        future = self.fetcher.submit(
+            FedoraResource, map_uri(uri, config.mapFrom, config.mapTo),
+            config, logger, console
+            )
+        try:
+            original = FedoraResource(uri, config, logger, console,
+                                      map_uris=True)
+        except Exception:
+            # report the source's error, discarding the target if it loaded
+            if future.exception() is None:
+                future.result().close()
+            raise
+        try:
+            destination = future.result()
+        except Exception:
+            original.close()
+            raise
+        return original, destination
+
+    def compare(self, original, destination=None):
+        """Compares a resource with its counterpart, fetching the
+        counterpart unless it is given.
+
+        Returns a tuple (verified, verification), or None if the resource is
+        excluded from verification by the configuration.
+        """
+        config = self.config
+        loggers = self.loggers
+
+        # create object representing destination resource
+        if destination is None and original.location == "fedora":
+            destination = LocalResource(original.destpath, config,
+                                        loggers.file_only, loggers.console)
+        elif destination is None:
+            destination = FedoraResource(original.destpath, config,
+                                         loggers.file_only, loggers.console)
+        try:
+            return self.compare_resources(original, destination)
+        finally:
+            destination.close()
+
+    def compare_resources(self, original, destination):
+        """Compares a resource with its counterpart by type.
+
+        Returns a tuple (verified, verification), or None if the resource is
+        excluded from verification by the configuration.
+        """
+        config = self.config
+
+        if not getattr(destination, "is_reachable", True):
+            return False, "destination not reachable"
+
+        # analyze the resource type
+        if original.type == "binary":
+            if destination.origpath.endswith(EXT_BINARY_EXTERNAL) or \
+                    (config.mode == "repository" and original.external):
+                if not self.config.external:
+                    return None
+
+            verified, verification = \
+                self.compare_binaries(original, destination)
+        elif original.type == "rdf":
+            # server managed triples, containment and excluded predicates
+            # have already been filtered out as the graphs were parsed
+            if original.large or destination.large:
+                verified, verification = \
+                    self.compare_out_of_core(original, destination)
+            # compare the original and destination graphs
+            elif isomorphic(original.graph, destination.graph):
+                verified = True
+                verification = "{0} triples".format(len(original.graph))
+            else:
+                verified = False
+                verification = ("{0}+{1} triples - mismatch".format(
+                    len(original.graph), len(destination.graph)
+                    ))
+
+            if config.containment_listing:
+                children_verified, children_verification = \
+                    self.compare_containment(original, destination)
+                verified = verified and children_verified
+                verification = "{0}, {1}".format(verification,
+                                                 children_verification)
+
+        return verified, verification
+
+    def check_resource(self, filepath):
+        """Verifies a single resource, returning a VerificationResult.
+
+        Returns None if the resource is excluded from verification by the
+        configuration. Errors are reported as failed verifications.
+        """
+        try:
+            return self.verify_resource(filepath)
+        except Exception as ex:
+            traceback.print_exc()
+            return VerificationResult(
+                "unknown", "unknown", filepath, filepath, "", False,
+                "Object could not be verified: {0}".format(ex)
+                )
+
+    def results(self, paths, executor=None, window=None):
+        """Generates a VerificationResult for each resource in paths.
+
+        Paths may be any iterable of repository URIs or local paths, such as
+        a walker. If an executor is given, resources are verified on it
+        concurrently, with at most window resources in flight, and results
+        are generated in the order they complete.
+        """
+        paths = (p for p in paths if p is not None)
+        if executor is None:
+            for filepath in paths:
+                result = self.check_resource(filepath)
+                if result is not None:
+                    yield result
+            return
+
+        if window is None:
+            window = 4 * max(self.config.workers, 1)
+        pending = set()
+        for filepath in paths:
+            pending.add(executor.submit(self.check_resource, filepath))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.result() is not None:
+                        yield future.result()
+        for future in as_completed(pending):
+            if future.result() is not None:
+                yield future.result()
+
+    def verify_resources(self, uris, executor=None):
+        """Generates a VerificationResult for each of the given repository
+        URIs or local paths, without walking the tree."""
+        return self.results(uris, executor)
+
+    def compare_binaries(self, original, destination):
+        """Compares two binaries, first by size and then by digest.
+
+        The digests are only computed if the sizes match, or cannot be
+        known, and are skipped entirely in size-only mode. Returns a tuple
+        (verified, verification).
+        """
+        sized = original.size is not None and destination.size is not None
+        if sized and original.size != destination.size:
+            return False, "size {0} != {1}".format(original.size,
+                                                   destination.size)
+        elif sized and self.config.size_only:
+            return True, "{0} bytes".format(original.size)
+        elif original.sha1 == destination.sha1:
+            return True, original.sha1
+        else:
+            return False, "{0} != {1}".format(original.sha1,
+                                              destination.sha1)
+
+    def compare_containment(self, original, destination):
+        """Compares the children of a container in the repository with the
+        entries of its directory on disk.
+
+        Returns a tuple (verified, verification).
+        """
+        original_children = original.child_names()
+        destination_children = destination.child_names()
+        missing = len(original_children - destination_children)
+        extra = len(destination_children - original_children)
+        if missing == 0 and extra == 0:
+            return True, "{0} children".format(len(original_children))
+        else:
+            return False, ("{0}+{1} children - mismatch ({2} missing, "
+                           "{3} extra)".format(len(original_children),
+                                               len(destination_children),
+                                               missing, extra))
+
+    def compare_out_of_core(self, original, destination):
+        """Compares two graphs as sorted N-Triples files on disk.
+
+        Returns a tuple (verified, verification).
+        """
+        from .outofcore import compare_sorted
+        common, missing, extra = compare_sorted(
+            original.sorted_triples(), destination.sorted_triples()
+            )
+        if missing == 0 and extra == 0:
+            return True, "{0} triples".format(common)
+        else:
+            return False, ("{0}+{1} triples - mismatch ({2} missing, "
+                           "{3} extra)".format(common + missing,
+                                               common + extra,
+                                               missing, extra))
+
     def execute(self):
         """Executes the verification process."""
         config = self.config
@@ -52,9 +317,22 @@ class FedoraImportExportVerifier:
                 )
             sys.exit(1)
 
+        if config.mode == "repository":
+            target = Repository(config, loggers, config.mapTo)
+            console.info("Testing connection to {0}...".format(target.root))
+            if target.is_reachable():
+                console.info("Connection successful.")
+            else:
+                console.error(
+                    "Connection to {0} failed. Exiting.".format(target.root)
+                    )
+                sys.exit(1)
+
         # Set up csv file, if specified
         os.makedirs(output_dir, exist_ok=True)
-        datestr = datetime.datetime.today().strftime('%Y%m%d-%H%M')
+        # include seconds so that a re-verification using the report of an
+        # earlier run as input does not overwrite it
+        datestr = datetime.datetime.today().strftime('%Y%m%d-%H%M%S')
         csvfilename = "{0}/report-{1}.csv".format(output_dir, datestr)
         csvfile = open(csvfilename, "w")
         fieldnames = ["number", "type", "original", "destination",
@@ -64,10 +342,7 @@ class FedoraImportExportVerifier:
         writer.writeheader()
 
         console.info("Starting verification...")
-        if config.mode == "export":
-            tree = FcrepoWalker(config, logger)
-        elif config.mode == "import":
-            tree = LocalWalker(config, logger)
+        tree = get_walker(config, logger)
 
         console.info(
             "Running verification on Fedora 4 {0}".format(config.mode)
@@ -84,11 +359,16 @@ class FedoraImportExportVerifier:
         def total_count():
             return success_count + failure_count
 
+        limiter = getattr(config.session, "limiter", None)
+
         def log_summary(logger):
-            logger.info(
+            summary = \
                 "Verified {} resources: successes = {}, failures = {}".format(
                     total_count(), success_count, failure_count)
-                    )
+            if limiter is not None:
+                summary += ", concurrency limit = {}".format(
+                    limiter.current_limit)
+            logger.info(summary)
 
         def count_logger():
             while(True):
@@ -99,136 +379,53 @@ class FedoraImportExportVerifier:
         t.daemon = True
         t.start()
 
+        executor = None
+        if config.workers > 1:
+            executor = ThreadPoolExecutor(max_workers=config.workers)
+
         # Step through the tree and verify resources
-        for filepath in tree:
-
-            # iterator can return None, in which case skip
-            if filepath is not None:
-
-                try:
-
-                    # path begins with repository base = fedora resource
-                    if filepath.startswith(config.repobase):
-                        original = FedoraResource(filepath, config, logger,
-                                                  console)
-                        if not original.is_reachable:
-                            verified = False
-                            verification = "original not reachable"
-                    # path begins with local root dir = local resource
-                    elif filepath.startswith(config.dir):
-                        original = LocalResource(filepath, config, logger,
-                                                 console)
-                    # any other path indicates an error
-                    else:
-                        # TODO: Consider handling this error and continuing
-                        logger.error(
-                            "Resource in unexpected location."
-                            )
-                        sys.exit(1)
-
-                    # if binaries not included in export
-                    if not config.bin:
-                        # skip binaries and fcr:metadata
-                        if original.type == "binary" or \
-                                original.origpath.endswith("/fcr:metadata"):
-                            continue
-                        # filter refs to binary resources from rdf resources
-                        else:
-                            original.filter_binary_refs()
-
-                    # create object representing destination resource
-                    if filepath.startswith(config.repobase):
-                        destination = LocalResource(original.destpath,
-                                                    config,
-                                                    loggers.file_only,
-                                                    loggers.console)
-                    elif filepath.startswith(config.dir):
-                        destination = FedoraResource(original.destpath,
-                                                     config,
-                                                     loggers.file_only,
-                                                     loggers.console)
-
-                    # analyze the resource type
-                    if original.type == "binary":
-                        if destination.origpath.endswith(EXT_BINARY_EXTERNAL):
-                            if not self.config.external:
-                                continue
-
-                        if original.sha1 == destination.sha1:
-                            verified = True
-                            verification = original.sha1
-                        else:
-                            verified = False
-                            verification = "{0} != {1}".format(
-                                original.sha1, destination.sha1
-                                )
-                    elif original.type == "rdf":
-                        # if legacyMode is set, filter graph on import
-                        if config.legacyMode:
-                            if config.mode == "export":
-                                pass
-                            elif config.mode == "import":
-                                to_filter = destination.server_managed
-                                for p in to_filter.predicates():
-                                    original.graph.remove(
-                                        Graph().triples((None, p, None))
-                                        )
-                                destination.graph = destination.minimal
-                        # compare the original and destination graphs
-                        if isomorphic(original.graph, destination.graph):
-                            verified = True
-                            verification = \
-                                "{0} triples".format(len(original.graph))
-                        else:
-                            verified = False
-                            verification = ("{0}+{1} triples - mismatch"
-                                            .format(
-                                                len(original.graph),
-                                                len(destination.graph)
-                                                ))
-
-                    logger.info(
-                        "RESOURCE {0}: {1} {2}".format(
-                            total_count(), original.location, original.type)
-                            )
-
-                except Exception as ex:
-                    traceback.print_exc()
-                    verified = False
-                    verification = ("Object could not be verified: {"
-                                    "0}".format(ex))
-
-                if not verified:
-                    logger.warn(
-                        "Resource Mismatch \"{}\"".format(original.relpath)
+        for result in self.results(tree, executor):
+
+            logger.info(
+                "RESOURCE {0}: {1} {2}".format(
+                    total_count(), result.location, result.type)
+                    )
+
+            if not result.verified:
+                logger.warn(
+                    "Resource Mismatch \"{}\"".format(result.relpath)
+                    )
+                failure_count += 1
+            else:
+                success_count += 1
+
+            if config.verbose:
+                logger.info("  rel  => {}".format(result.relpath))
+                logger.info("  orig => {}".format(result.original))
+                logger.info("  dest => {}".format(result.destination))
+
+                logger_method = logger.info
+
+                if not result.verified:
+                    logger_method = logger.warn
+
+                logger_method(
+                    "  Verified original to copy... {0} -- {1}".format(
+                        result.verified, result.verification)
                         )
-                    failure_count += 1
-                else:
-                    success_count += 1
-
-                if config.verbose:
-                    logger.info("  rel  => {}".format(original.relpath))
-                    logger.info("  orig => {}".format(original.origpath))
-                    logger.info("  dest => {}".format(original.destpath))
-
-                    logger_method = logger.info
-
-                    if not verified:
-                        logger_method = logger.warn
-
-                    logger_method(
-                        "  Verified original to copy... {0} -- {1}".format(
-                            verified, verification)
-                            )
-
-                # write csv if exists
-                row = {"number":       str(total_count()),
-                       "type":         original.type,
-                       "original":     original.origpath,
-                       "destination":  original.destpath,
-                       "verified":     str(verified),
-                       "verification": verification}
-                writer.writerow(row)
+
+            # write csv if exists
+            row = {"number":       str(total_count()),
+                   "type":         result.type,
+                   "original":     result.original,
+                   "destination":  result.destination,
+                   "verified":     str(result.verified),
+                   "verification": result.verification}
+            writer.writerow(row)
+
+        if executor is not None:
+            executor.shutdown()
+        config.digest_cache.save()
 
         log_summary(console)
         console.info("Verification complete")
@@ -0,0 +1,52 @@
+import requests
+
+
+class MockResponse:
+    """A canned response with the parts of requests.Response that the
+    verifier uses. The body may be given as text or bytes."""
+    def __init__(self, status_code, body="", headers=None, ldp_type=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.status_code = status_code
+        self.headers = dict(headers or {})
+        self.links = {"type": {"url": ldp_type}} if ldp_type else {}
+        self.content = body
+        self.encoding = "utf-8"
+        self.text = body.decode("utf-8")
+
+    def iter_content(self, chunk_size=1):
+        yield self.content
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(
+                "{0} error".format(self.status_code), response=self)
+
+    def close(self):
+        pass
+
+
+class MockSession:
+    """Serves canned responses by URI, recording each request as a tuple
+    (method, url).
+
+    A response may also be an exception, which is raised, and URIs without
+    a response answer 404. Override respond() to compute responses.
+    """
+    def __init__(self, responses=None):
+        self.responses = dict(responses or {})
+        self.requested = []
+
+    def respond(self, method, url):
+        response = self.responses.get(url, MockResponse(404))
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def head(self, url, auth=None, **kwargs):
+        self.requested.append(("HEAD", url))
+        return self.respond("HEAD", url)
+
+    def get(self, url, auth=None, **kwargs):
+        self.requested.append(("GET", url))
+        return self.respond("GET", url)
@@ -0,0 +1,117 @@
+from fcrepo_verify.api import build_config, verify_resources
+from fcrepo_verify.constants import LDP_NON_RDF_SOURCE
+from hashlib import sha1
+import os
+import pytest
+import tempfile
+
+from .conftest import MockResponse, MockSession
+
+CONTENT = b"binary content\n"
+REPO = "http://localhost:8080/rest"
+
+
+class BinarySession(MockSession):
+    """Serves a single binary resource."""
+    def __init__(self, digest):
+        MockSession.__init__(self)
+        self.digest = digest
+
+    def respond(self, method, url):
+        if method == "HEAD":
+            return MockResponse(
+                200, headers={"Content-Length": str(len(CONTENT))},
+                ldp_type=LDP_NON_RDF_SOURCE)
+        return MockResponse(200, "<{0}> premis:hasMessageDigest "
+                            "<urn:sha1:{1}> .".format(url, self.digest))
+
+
+def make_export():
+    datadir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(datadir, "rest"))
+    path = os.path.join(datadir, "rest", "file.binary")
+    with open(path, "wb") as f:
+        f.write(CONTENT)
+    return datadir, path
+
+
+def test_verify_resources_with_session():
+    datadir, path = make_export()
+    session = BinarySession(sha1(CONTENT).hexdigest())
+    config = build_config({"mode": "import", "resource": REPO,
+                           "dir": datadir, "binaries": True},
+                          session=session)
+    results = list(verify_resources([path], config))
+    assert len(results) == 1
+    assert results[0].verified
+    assert results[0].type == "binary"
+    assert results[0].destination == REPO + "/file"
+    assert ("HEAD", REPO + "/file") in session.requested
+    # results are compact records that do not keep resources alive
+    assert not hasattr(results[0], "__dict__")
+
+
+def test_verify_resources_reports_mismatch():
+    datadir, path = make_export()
+    config = build_config({"mode": "import", "resource": REPO,
+                           "dir": datadir, "binaries": True},
+                          session=BinarySession("0" * 40))
+    results = list(verify_resources([path], config))
+    assert not results[0].verified
+
+
+def test_size_mismatch_skips_digest():
+    datadir, path = make_export()
+    with open(path, "wb") as f:
+        f.write(CONTENT[:5])
+    session = BinarySession(sha1(CONTENT).hexdigest())
+    config = build_config({"mode": "import", "resource": REPO,
+                           "dir": datadir, "binaries": True},
+                          session=session)
+    results = list(verify_resources([path], config))
+    assert not results[0].verified
+    assert results[0].verification == "size 5 != {0}".format(len(CONTENT))
+    assert not [r for r in session.requested if r[0] == "GET"]
+
+
+def test_size_only():
+    datadir, path = make_export()
+    session = BinarySession("0" * 40)
+    config = build_config({"mode": "import", "resource": REPO,
+                           "dir": datadir, "binaries": True},
+                          session=session, size_only=True)
+    results = list(verify_resources([path], config))
+    assert results[0].verified
+    assert not [r for r in session.requested if r[0] == "GET"]
+
+
+def test_verify_resources_outside_tree_fails_without_exiting():
+    datadir, path = make_export()
+    config = build_config({"mode": "import", "resource": REPO,
+                           "dir": datadir, "binaries": True},
+                          session=BinarySession("0" * 40))
+    results = list(verify_resources(["/elsewhere/file.binary"], config))
+    assert not results[0].verified
+    assert "unexpected location" in results[0].verification
+
+
+def test_default_session_pool_fits_workers():
+    datadir, path = make_export()
+    config = build_config({"mode": "import", "resource": REPO,
+                           "dir": datadir}, workers=16)
+    adapter = config.session.get_adapter(REPO)
+    assert adapter._pool_maxsize >= 16 * 4
+
+
+def test_repository_mode_without_map_raises():
+    with pytest.raises(ValueError):
+        build_config({"mode": "repository", "resource": REPO},
+                     session=BinarySession("0" * 40))
+
+
+def test_unrecognized_rdf_serialization_raises():
+    datadir, path = make_export()
+    with pytest.raises(ValueError):
+        build_config({"mode": "import", "resource": REPO, "dir": datadir,
+                      "rdfLang": "text/unknown"},
+                     session=BinarySession("0" * 40))
@@ -0,0 +1,73 @@
+from fcrepo_verify.api import build_config
+from fcrepo_verify.constants import LDP_CONTAINS, LDP_NON_RDF_SOURCE
+from fcrepo_verify.resources import FedoraResource, LocalResource
+from fcrepo_verify.verifier import FedoraImportExportVerifier
+import os
+import pytest
+import tempfile
+
+from .conftest import MockResponse, MockSession
+
+REPO = "http://localhost:8080/rest"
+LDP_RDF_SOURCE = "http://www.w3.org/ns/ldp#RDFSource"
+CHILDREN = {REPO + "/box/doc": LDP_RDF_SOURCE,
+            REPO + "/box/file": LDP_NON_RDF_SOURCE}
+
+
+def container_session(status_code):
+    """Serves a container holding an RDF resource and a binary."""
+    responses = dict((child, MockResponse(200, ldp_type=ldp_type))
+                     for child, ldp_type in CHILDREN.items())
+    responses[REPO + "/box"] = MockResponse(
+        status_code, "".join("<{0}/box> <{1}> <{2}> .\n".format(
+            REPO, LDP_CONTAINS, child) for child in sorted(CHILDREN)),
+        {"Content-Type": "application/n-triples"})
+    return MockSession(responses)
+
+
+def make_resources(binaries, status_code=200):
+    datadir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(datadir, "rest", "box"))
+    for name in ("doc.ttl", "file.binary"):
+        open(os.path.join(datadir, "rest", "box", name), "w").close()
+    config = build_config({"mode": "export", "resource": REPO,
+                           "dir": datadir, "binaries": binaries},
+                          session=container_session(status_code),
+                          containment_listing=True)
+    fedora = FedoraResource.__new__(FedoraResource)
+    fedora.origpath = REPO + "/box"
+    fedora.config = config
+    local = LocalResource.__new__(LocalResource)
+    local.origpath = os.path.join(datadir, "rest", "box.ttl")
+    local.config = config
+    return config, fedora, local
+
+
+def test_fedora_child_names():
+    config, fedora, local = make_resources(True)
+    assert fedora.child_names() == {"doc", "file"}
+    assert local.child_names() == {"doc", "file"}
+
+
+def test_fedora_child_names_fails_on_error_response():
+    config, fedora, local = make_resources(True, status_code=500)
+    with pytest.raises(IOError):
+        fedora.child_names()
+
+
+def test_compare_containment():
+    config, fedora, local = make_resources(True)
+    verifier = FedoraImportExportVerifier(config, None)
+    assert verifier.compare_containment(fedora, local) == \
+        (True, "2 children")
+    os.remove(local.origpath[:-len(".ttl")] + "/doc.ttl")
+    verified, verification = verifier.compare_containment(fedora, local)
+    assert not verified
+    assert "1 missing, 0 extra" in verification
+
+
+def test_compare_containment_without_binaries():
+    config, fedora, local = make_resources(False)
+    verifier = FedoraImportExportVerifier(config, None)
+    assert verifier.compare_containment(fedora, local) == \
+        (True, "1 children")
@@ -0,0 +1,93 @@
+from fcrepo_verify.digests import DigestCache
+from fcrepo_verify.resources import FedoraResource
+from fcrepo_verify.transport import ResilientSession
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import pytest
+import tempfile
+import threading
+
+CONTENT = b"external content\n" * 1000
+ETAG = '"v1"'
+
+
+class ExternalHandler(BaseHTTPRequestHandler):
+    """Serves content with an ETag, honouring If-None-Match."""
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(CONTENT)))
+        self.end_headers()
+        self.wfile.write(CONTENT)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    ExternalHandler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ExternalHandler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield "http://127.0.0.1:{0}/content".format(httpd.server_port)
+    httpd.shutdown()
+
+
+class MockConfig:
+    def __init__(self, cache_path):
+        self.session = ResilientSession()
+        self.digest_cache = DigestCache(cache_path)
+
+
+def external_sha1(config, uri):
+    resource = FedoraResource.__new__(FedoraResource)
+    resource.config = config
+    return resource._calculate_sha1_from_uri(uri)
+
+
+def test_external_digest_is_cached_between_runs(server):
+    path = os.path.join(tempfile.mkdtemp(), "digests.json")
+    expected = sha1(CONTENT).hexdigest()
+
+    config = MockConfig(path)
+    assert external_sha1(config, server) == expected
+    assert external_sha1(config, server) == expected
+    config.digest_cache.save()
+
+    # a later run revalidates the saved digest instead of downloading
+    config = MockConfig(path)
+    assert external_sha1(config, server) == expected
+    assert ExternalHandler.requests == [None, ETAG, ETAG]
+
+
+def test_digests_without_validators_are_not_cached():
+    cache = DigestCache()
+    cache.put("http://example.org/a", "abc")
+    assert cache.get("http://example.org/a") is None
+    assert cache.conditional_headers("http://example.org/a") == {}
+
+
+def test_external_content_bypasses_the_repository_limiter(server):
+    config = MockConfig(None)
+    config.session = ResilientSession(max_concurrency=1, hedge=True)
+    # the repository's only slot is taken
+    config.session.limiter.acquire()
+    digests = []
+    thread = threading.Thread(
+        target=lambda: digests.append(external_sha1(config, server))
+        )
+    thread.daemon = True
+    thread.start()
+    thread.join(5)
+    assert digests == [sha1(CONTENT).hexdigest()]
+    assert len(config.session.latencies.samples) == 0
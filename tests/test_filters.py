@@ -0,0 +1,99 @@
+from fcrepo_verify.filters import FilterPipeline, PredicateFilter, \
+    ServerManagedFilter, build_triple_filter
+from fcrepo_verify.constants import EXT_MAP, FEDORA_NS, LDP_CONTAINS, \
+    LDP_NS, PREMIS_NS, RDF_TYPE, SERVER_MANAGED_NAMESPACES
+from fcrepo_verify.ntriples import parser_format
+from fcrepo_verify.resources import Resource
+from rdflib import Graph, Literal, URIRef
+import pytest
+
+
+class MockConfig(dict):
+    pass
+
+
+def make_config():
+    config = MockConfig({})
+    config.exclude_predicates = []
+    config.containment_listing = False
+    config.legacyMode = False
+    config.mode = "import"
+    config.bin = True
+    config.server_managed_namespaces = SERVER_MANAGED_NAMESPACES
+    return config
+
+
+SUBJECT = URIRef("http://localhost:8080/rest/a")
+TITLE = (SUBJECT, URIRef("http://purl.org/dc/terms/title"), Literal("a"))
+CREATED = (SUBJECT, URIRef(FEDORA_NS + "created"), Literal("2017"))
+CONTAINS = (SUBJECT, URIRef(LDP_CONTAINS), URIRef(SUBJECT + "/b"))
+TYPE = (SUBJECT, URIRef(RDF_TYPE), URIRef(FEDORA_NS + "Container"))
+USER_TYPE = (SUBJECT, URIRef(RDF_TYPE), URIRef("http://example.org/Thing"))
+LDP_TYPE = (SUBJECT, URIRef(RDF_TYPE), URIRef(LDP_NS + "DirectContainer"))
+MEMBERSHIP = (SUBJECT, URIRef(LDP_NS + "membershipResource"),
+              URIRef(SUBJECT + "/c"))
+DIGEST = (SUBJECT, URIRef(PREMIS_NS + "hasMessageDigest"),
+          URIRef("urn:sha1:da39a3ee5e6b4b0d3255bfef95601890afd80709"))
+
+
+def test_predicate_filter():
+    f = PredicateFilter([LDP_CONTAINS])
+    assert f.accepts(TITLE)
+    assert not f.accepts(CONTAINS)
+
+
+def test_server_managed_filter():
+    f = ServerManagedFilter()
+    assert f.accepts(TITLE)
+    assert f.accepts(USER_TYPE)
+    assert not f.accepts(CREATED)
+    assert not f.accepts(CONTAINS)
+    assert not f.accepts(TYPE)
+    assert not f.accepts(LDP_TYPE)
+    assert not f.accepts(DIGEST)
+    assert f.accepts(MEMBERSHIP)
+
+
+def test_server_managed_namespaces_are_configurable():
+    f = ServerManagedFilter(namespaces=["http://purl.org/dc/terms/"])
+    assert not f.accepts(TITLE)
+    assert f.accepts(CREATED)
+    assert f.accepts(TYPE)
+    assert not f.accepts(LDP_TYPE)
+    assert not f.accepts(DIGEST)
+
+
+def test_pipeline_requires_all_filters():
+    f = FilterPipeline([PredicateFilter([LDP_CONTAINS]),
+                        PredicateFilter([TITLE[1]])])
+    assert f.accepts(CREATED)
+    assert not f.accepts(CONTAINS)
+    assert not f.accepts(TITLE)
+
+
+def test_build_triple_filter():
+    config = make_config()
+    assert build_triple_filter(config) is None
+
+    config.exclude_predicates = [str(TITLE[1])]
+    config.legacyMode = True
+    f = build_triple_filter(config)
+    assert len(f.filters) == 2
+    assert not f.accepts(TITLE)
+    assert not f.accepts(TYPE)
+    assert f.accepts(USER_TYPE)
+
+
+@pytest.mark.parametrize("rdf_format", sorted(EXT_MAP))
+def test_filters_apply_to_every_serialization(rdf_format):
+    graph = Graph()
+    for triple in (TITLE, CONTAINS):
+        graph.add(triple)
+    data = graph.serialize(format=parser_format(rdf_format))
+    config = make_config()
+    config.triple_filter = PredicateFilter([LDP_CONTAINS])
+    resource = Resource.__new__(Resource)
+    resource.config = config
+    resource.large = False
+    resource.parse_graph(rdf_format, data=data)
+    assert set(resource.graph) == {TITLE}
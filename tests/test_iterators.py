@@ -0,0 +1,88 @@
+from fcrepo_verify.iterators import FcrepoWalker, ListWalker, \
+    ParallelLocalWalker
+import logging
+import os
+import requests
+import tempfile
+
+from .conftest import MockResponse, MockSession
+
+REPORT = """number,type,original,destination,verified,verification
+1,rdf,http://localhost/rest/a,/tmp/rest/a.ttl,True,2 triples
+2,rdf,http://localhost/rest/b,/tmp/rest/b.ttl,False,2+3 triples - mismatch
+3,binary,http://localhost/rest/c,/tmp/rest/c.binary,False,"abc != def"
+"""
+
+URIS = """# resources to re-check
+http://localhost/rest/a
+
+/tmp/rest/b.ttl
+"""
+
+
+class MockConfig:
+    def __init__(self, datadir):
+        self.dir = datadir
+        self.bag = False
+
+
+def write_temp(content):
+    path = tempfile.mkstemp()[1]
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+def test_list_walker_reads_report_failures():
+    walker = ListWalker(write_temp(REPORT), None)
+    assert list(walker) == ["http://localhost/rest/b",
+                            "http://localhost/rest/c"]
+
+
+def test_list_walker_reads_uri_list():
+    walker = ListWalker(write_temp(URIS), None)
+    assert list(walker) == ["http://localhost/rest/a", "/tmp/rest/b.ttl"]
+
+
+def test_parallel_local_walker_yields_files():
+    datadir = tempfile.mkdtemp()
+    expected = set()
+    for parent in ("rest", "rest/a", "rest/a/b", "rest/c", "rest/.hidden"):
+        os.makedirs(os.path.join(datadir, parent), exist_ok=True)
+        path = os.path.join(datadir, parent, "x.ttl")
+        with open(path, "w") as f:
+            f.write(parent)
+        if ".hidden" not in parent:
+            expected.add(path)
+    config = MockConfig(datadir)
+    walker = ParallelLocalWalker(config, None, 4)
+    paths = list(walker)
+    assert set(paths) == expected
+    assert len(paths) == len(expected)
+    for path in paths:
+        assert path.size == os.path.getsize(path)
+
+
+def failing_session(root):
+    """Serves a root container whose children cannot be read."""
+    return MockSession({
+        root: MockResponse(200, "".join(
+            "<{0}> <http://www.w3.org/ns/ldp#contains> <{0}/{1}> .\n".format(
+                root, child) for child in ("down", "busy")),
+            {"Content-Type": "application/n-triples"}),
+        root + "/down": requests.ConnectionError("connection refused"),
+        root + "/busy": MockResponse(503)
+        })
+
+
+def test_fcrepo_walker_returns_unreadable_nodes():
+    config = MockConfig(None)
+    config.repo = "http://localhost/rest"
+    config.auth = None
+    config.inbound = False
+    config.predicates = ["http://www.w3.org/ns/ldp#contains"]
+    config.session = failing_session(config.repo)
+    walker = FcrepoWalker(config, logging.getLogger("test"))
+    assert sorted(walker) == ["http://localhost/rest",
+                              "http://localhost/rest/busy",
+                              "http://localhost/rest/down"]
@@ -0,0 +1,67 @@
+from fcrepo_verify.ntriples import ParseError, iter_triples, parse_triples, \
+    read_ntriples, split_ranges
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.compare import isomorphic
+import pytest
+import tempfile
+
+DATA = """# a comment
+<http://example.org/a> <http://example.org/p> <http://example.org/b> .
+<http://example.org/a> <http://example.org/p> "caf\\u00E9 \\"quoted\\"" .
+<http://example.org/a> <http://example.org/p> "hello"@en-GB .
+<http://example.org/a> <http://example.org/p> \
+"3"^^<http://www.w3.org/2001/XMLSchema#integer> .
+
+_:b1 <http://example.org/q> _:b2 .
+_:b2 <http://example.org/q> "line\\nbreak" . # trailing comment
+"""
+
+
+def test_iter_triples_terms():
+    triples = list(iter_triples(DATA.splitlines()))
+    assert len(triples) == 6
+    assert triples[0][2] == URIRef("http://example.org/b")
+    assert triples[1][2] == Literal('café "quoted"')
+    assert triples[2][2] == Literal("hello", lang="en-GB")
+    assert triples[3][2].value == 3
+    assert isinstance(triples[4][0], BNode)
+    # blank node labels are consistent within a document
+    assert triples[4][2] == triples[5][0]
+    assert triples[5][2] == Literal("line\nbreak")
+
+
+def test_matches_rdflib_parser():
+    native = Graph()
+    for triple in iter_triples(DATA.splitlines()):
+        native.add(triple)
+    parsed = Graph().parse(data=DATA, format="application/n-triples")
+    assert isomorphic(native, parsed)
+
+
+def test_invalid_line():
+    with pytest.raises(ParseError):
+        list(iter_triples(["<http://example.org/a> oops ."]))
+
+
+def test_read_ranges_cover_file():
+    path = tempfile.mkstemp()[1]
+    with open(path, "w") as f:
+        for i in range(100):
+            f.write("<http://example.org/{0}> <http://example.org/p> "
+                    "\"{0}\" .\n".format(i))
+    ranges = split_ranges(path, 3)
+    assert len(ranges) == 3
+    objects = []
+    for start, end in ranges:
+        objects.extend(str(o) for s, p, o in read_ntriples(path, start, end))
+    assert objects == [str(i) for i in range(100)]
+
+
+@pytest.mark.parametrize("separator", ["\x0b", "\x0c", "\x1c", "\x85",
+                                       "\u2028", "\u2029"])
+def test_parse_triples_keeps_line_separators_in_literals(separator):
+    data = '<http://a/s> <http://a/p> "a{0}b" .\n'.format(separator)
+    triples = []
+    parse_triples(triples.append, "application/n-triples", data=data)
+    assert triples == [(URIRef("http://a/s"), URIRef("http://a/p"),
+                        Literal("a{0}b".format(separator)))]
@@ -0,0 +1,155 @@
+from fcrepo_verify.outofcore import SortedTriples, compare_sorted, \
+    sort_source
+import os
+import pytest
+import tempfile
+from rdflib import BNode, Graph, Literal, URIRef
+
+TURTLE = """
+@prefix ex: <http://example.org/> .
+ex:a ex:p "one", "two\\nlines"@EN ;
+     ex:q ex:b, ex:c .
+"""
+
+NTRIPLES = """<http://example.org/a> <http://example.org/q> \
+<http://example.org/c> .
+<http://example.org/a> <http://example.org/p> "one" .
+<http://example.org/a> <http://example.org/p> "two\\nlines"@en .
+<http://example.org/a> <http://example.org/q> <http://example.org/b> .
+<http://example.org/a> <http://example.org/q> <http://example.org/b> .
+"""
+
+
+def test_sorted_triples_merges_runs():
+    sorter = SortedTriples(chunk_size=2)
+    for line in ["c\n", "a\n", "b\n", "a\n", "d\n"]:
+        sorter.add(line)
+    path = sorter.finish()
+    with open(path) as f:
+        assert f.read() == "a\nb\nc\nd\n"
+    os.remove(path)
+
+
+def test_compare_equal_graphs():
+    first = sort_source("text/turtle", data=TURTLE)
+    second = sort_source("application/n-triples", data=NTRIPLES)
+    assert compare_sorted(first, second) == (4, 0, 0)
+    os.remove(first)
+    os.remove(second)
+
+
+def test_compare_counts_missing_and_extra():
+    first = sort_source("text/turtle", data=TURTLE)
+    second = sort_source("text/turtle",
+                         data=TURTLE.replace("ex:c", "ex:d") + "ex:e ex:p 1 .")
+    assert compare_sorted(first, second) == (3, 1, 2)
+    os.remove(first)
+    os.remove(second)
+
+
+def test_sort_source_filters_triples():
+    first = sort_source("text/turtle", data=TURTLE,
+                        accepts=lambda t: str(t[1]) != "http://example.org/q")
+    with open(first) as f:
+        assert len(f.readlines()) == 2
+    os.remove(first)
+
+
+BNODES = """
+@prefix ex: <http://example.org/> .
+ex:a ex:p [ ex:q [ ex:r "x" ] ] .
+ex:a ex:p [ ex:r "y" ] .
+"""
+
+
+def test_isomorphic_blank_nodes_compare_equal():
+    first = sort_source("text/turtle", data=BNODES)
+    second = sort_source("text/turtle", data=BNODES)
+    assert compare_sorted(first, second) == (5, 0, 0)
+    os.remove(first)
+    os.remove(second)
+
+
+def test_blank_node_structure_is_compared():
+    # the same triples up to blank node labels, but a different structure
+    first = sort_source("application/n-triples", data="""\
+<http://example.org/a> <http://example.org/p> _:x .
+<http://example.org/a> <http://example.org/p> _:y .
+_:x <http://example.org/r> "1" .
+_:y <http://example.org/r> "2" .
+""")
+    second = sort_source("application/n-triples", data="""\
+<http://example.org/a> <http://example.org/p> _:x .
+<http://example.org/a> <http://example.org/p> _:y .
+_:x <http://example.org/r> "1" .
+_:x <http://example.org/r> "2" .
+""")
+    assert compare_sorted(first, second) != (4, 0, 0)
+    os.remove(first)
+    os.remove(second)
+
+
+@pytest.mark.parametrize("rdf_format", ["application/ld+json", "text/n3"])
+def test_sort_source_reads_formats_that_bypass_graph_add(rdf_format):
+    graph = Graph().parse(data=TURTLE, format="text/turtle")
+    first = sort_source(rdf_format, data=graph.serialize(format=rdf_format))
+    second = sort_source("text/turtle", data=TURTLE)
+    assert compare_sorted(first, second) == (4, 0, 0)
+    os.remove(first)
+    os.remove(second)
+
+
+def test_duplicated_blank_nodes_are_counted():
+    single = """\
+<http://example.org/a> <http://example.org/p> _:x .
+_:x <http://example.org/r> "1" .
+"""
+    double = single + single.replace("_:x", "_:y")
+    first = sort_source("application/n-triples", data=double)
+    second = sort_source("application/n-triples", data=single)
+    assert compare_sorted(first, second) == (2, 2, 0)
+    os.remove(first)
+    os.remove(second)
+
+
+def rdf_list(length, name="n"):
+    """Returns an rdf:List of length items in N-Triples."""
+    rdf = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+    lines = ["<http://example.org/a> <http://example.org/p> _:{0}0 .".format(
+        name)]
+    for i in range(length):
+        rest = "_:{0}{1}".format(name, i + 1) if i + 1 < length else \
+            "<{0}nil>".format(rdf)
+        lines.append('_:{0}{1} <{2}first> "{3}" .'.format(name, i, rdf,
+                                                          i % 3))
+        lines.append("_:{0}{1} <{2}rest> {3} .".format(name, i, rdf, rest))
+    return "\n".join(lines) + "\n"
+
+
+def test_long_lists_compare_equal():
+    first = sort_source("application/n-triples", data=rdf_list(5000))
+    second = sort_source("application/n-triples", data=rdf_list(5000, "m"))
+    assert compare_sorted(first, second) == (10001, 0, 0)
+    os.remove(first)
+    os.remove(second)
+
+
+def test_blank_nodes_are_labelled_across_ranges():
+    fd, path = tempfile.mkstemp(suffix=".nt")
+    with os.fdopen(fd, "w") as f:
+        f.write(rdf_list(1000))
+    first = sort_source("application/n-triples", location=path, workers=3)
+    second = sort_source("application/n-triples", data=rdf_list(1000, "m"))
+    assert compare_sorted(first, second) == (2001, 0, 0)
+    for p in (path, first, second):
+        os.remove(p)
+
+
+def test_too_many_blank_nodes_are_refused():
+    sorter = SortedTriples(max_bnode_triples=1)
+    p = URIRef("http://example.org/p")
+    sorter.add_triple((BNode("x"), p, Literal("1")))
+    paths = list(sorter.bnode_files)
+    with pytest.raises(ValueError):
+        sorter.add_triple((BNode("y"), p, Literal("2")))
+    assert not any(os.path.exists(path) for path in paths)
@@ -0,0 +1,84 @@
+from fcrepo_verify.planner import FedoraImportExportPlanner, format_duration
+from fcrepo_verify.constants import LDP_NON_RDF_SOURCE
+from fcrepo_verify.loggers import Loggers
+import logging
+import os
+import tempfile
+
+from .conftest import MockResponse
+
+
+class MockConfig(dict):
+    pass
+
+
+def make_config(datadir):
+    config = MockConfig({})
+    config.dir = datadir
+    config.bag = False
+    config.bin = True
+    config.external = False
+    config.ext = ".ttl"
+    config.mode = "import"
+    config.repobase = "http://localhost:8080"
+    config.input_file = None
+    config.workers = 1
+    return config
+
+
+def write_file(path, size):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+
+
+def test_inventory_local():
+    datadir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(datadir, "rest", "child"))
+    write_file(os.path.join(datadir, "rest.ttl"), 10)
+    write_file(os.path.join(datadir, "rest", "child.ttl"), 10)
+    write_file(os.path.join(datadir, "rest", "child", "file.binary"), 100)
+    write_file(os.path.join(datadir, "rest", "child", "ext.external"), 5)
+    write_file(os.path.join(datadir, "rest", "notes.txt"), 1)
+
+    logger = logging.getLogger("test")
+    loggers = Loggers(logger, logger, logger)
+    planner = FedoraImportExportPlanner(make_config(datadir), loggers, 1)
+    planner.inventory()
+    assert planner.rdf_count == 2
+    assert planner.binary_count == 1
+    assert planner.binary_bytes == 100
+    assert planner.skipped_count == 2
+    assert len(planner.samples["rdf"]) == 1
+    assert len(planner.samples["binary"]) == 1
+
+
+def binary_head(status_code, length):
+    return MockResponse(status_code, headers={"Content-Length": str(length)},
+                        ldp_type=LDP_NON_RDF_SOURCE)
+
+
+def test_external_binaries_are_counted_apart():
+    config = make_config(tempfile.mkdtemp())
+    config.external = True
+    logger = logging.getLogger("test")
+    planner = FedoraImportExportPlanner(config,
+                                        Loggers(logger, logger, logger))
+    uri = config.repobase + "/rest/ext"
+    # the length of a redirect is not that of the external content
+    assert planner.classify_fedora(uri, binary_head(307, 20)) == \
+        ("external", 0)
+    assert planner.classify_fedora(uri, binary_head(200, 20)) == \
+        ("binary", 20)
+
+    planner.rdf_count = 0
+    planner.binary_count = planner.binary_bytes = 1000
+    planner.external_count = 100
+    planner.samples["binary"] = [("binary", 10)]
+    planner.samples["external"] = [("ext", 0)]
+    timings = {"binary": (1.0, 10), "external": (2.0, 0)}
+    planner.time_samples = lambda restype: timings[restype]
+    assert planner.estimate() == 100.0 + 200.0
+
+
+def test_format_duration():
+    assert format_duration(3725.4) == "1:02:05"
@@ -0,0 +1,82 @@
+from fcrepo_verify.api import build_config, verify_resources
+from fcrepo_verify.constants import LDP_NON_RDF_SOURCE
+import requests
+
+from .conftest import MockResponse, MockSession
+
+SOURCE = "http://old:8080/rest"
+TARGET = "http://new:8080/fcrepo/rest"
+RDF_SOURCE = "http://www.w3.org/ns/ldp#RDFSource"
+TITLE = "<http://purl.org/dc/terms/title>"
+DIGEST = "<http://www.loc.gov/premis/rdf/v1#hasMessageDigest>"
+
+
+def rdf_source(body):
+    return MockResponse(200, body, {"Content-Type": "application/n-triples"},
+                        RDF_SOURCE)
+
+
+def repository(base, title, digest, missing=()):
+    """Returns the resources of a repository, by URI."""
+    resources = {
+        base + "/a": rdf_source(
+            "<{0}/a> {1} \"{2}\" .\n<{0}/a> <http://example.org/rel> "
+            "<{0}/bin> .\n".format(base, TITLE, title)),
+        base + "/bin": MockResponse(200, headers={"Content-Length": "4"},
+                                    ldp_type=LDP_NON_RDF_SOURCE),
+        base + "/bin/fcr:metadata": rdf_source(
+            "<{0}/bin> premis:hasMessageDigest <urn:sha1:{1}> .\n".format(
+                base, digest)),
+        base + "/broken": requests.ConnectionError(
+            "source" if base == SOURCE else "target")
+        }
+    for uri in missing:
+        del resources[uri]
+    return resources
+
+
+def verify(uris, source, target):
+    session = MockSession(source)
+    session.responses.update(target)
+    config = build_config({"mode": "repository", "resource": SOURCE,
+                           "map": "{0},{1}".format(SOURCE, TARGET),
+                           "binaries": True}, session=session)
+    return dict((r.original, r) for r in verify_resources(uris, config)), \
+        session
+
+
+def test_repositories_match():
+    results, session = verify(
+        [SOURCE + "/a", SOURCE + "/bin"],
+        repository(SOURCE, "A", "abc"), repository(TARGET, "A", "abc"))
+    # source URIs are mapped onto the target before the graphs are compared
+    assert results[SOURCE + "/a"].verified
+    assert results[SOURCE + "/a"].destination == TARGET + "/a"
+    assert results[SOURCE + "/bin"].verified
+    assert results[SOURCE + "/bin"].verification == "abc"
+    assert ("GET", TARGET + "/bin/fcr:metadata") in session.requested
+
+
+def test_repositories_differ():
+    results, session = verify(
+        [SOURCE + "/a", SOURCE + "/bin"],
+        repository(SOURCE, "A", "abc"), repository(TARGET, "B", "def"))
+    assert not results[SOURCE + "/a"].verified
+    assert results[SOURCE + "/bin"].verification == "abc != def"
+
+
+def test_destination_not_reachable():
+    results, session = verify(
+        [SOURCE + "/a"], repository(SOURCE, "A", "abc"),
+        repository(TARGET, "A", "abc", missing=[TARGET + "/a"]))
+    assert results[SOURCE + "/a"].verification == \
+        "destination not reachable"
+
+
+def test_source_error_is_reported():
+    # both sides fail, and the error from the source is the one reported
+    results, session = verify([SOURCE + "/broken"],
+                              repository(SOURCE, "A", "abc"),
+                              repository(TARGET, "A", "abc"))
+    assert not results[SOURCE + "/broken"].verified
+    assert results[SOURCE + "/broken"].verification.endswith("source")
@@ -0,0 +1,167 @@
+from fcrepo_verify.transport import ConcurrencyLimiter, LatencyTracker, \
+    ResilientSession
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pickle
+import pytest
+import requests
+import threading
+import time
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Fails the first requests to /flaky and stalls every other request
+    to /slow."""
+    counts = {}
+
+    def do_HEAD(self):
+        count = self.counts.get(self.path, 0)
+        self.counts[self.path] = count + 1
+        if self.path == "/flaky" and count < 2:
+            self.send_response(503)
+        elif self.path == "/slow" and count % 2 == 0:
+            time.sleep(1)
+            self.send_response(200)
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FlakyHandler.counts = {}
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield "http://127.0.0.1:{0}".format(httpd.server_port)
+    httpd.shutdown()
+
+
+def test_retries_server_errors(server):
+    session = ResilientSession(retries=3, backoff=0.01)
+    assert session.head(server + "/flaky").status_code == 200
+    assert FlakyHandler.counts["/flaky"] == 3
+
+
+def test_gives_up_after_retries(server):
+    session = ResilientSession(retries=1, backoff=0.01)
+    assert session.head(server + "/flaky").status_code == 503
+
+
+def test_unlimited_requests_are_retried(server):
+    session = ResilientSession(retries=3, backoff=0.01, max_concurrency=1)
+    assert session.head(server + "/flaky", limit=False).status_code == 200
+    assert FlakyHandler.counts["/flaky"] == 3
+    assert session.limiter.in_flight == 0
+    assert len(session.latencies.samples) == 0
+
+
+def test_read_timeout(server):
+    session = ResilientSession(timeout=(1, 0.2), retries=0)
+    with pytest.raises(requests.Timeout):
+        session.head(server + "/slow")
+
+
+def test_hedges_slow_requests(server):
+    session = ResilientSession(hedge=True, hedge_workers=2)
+    for i in range(20):
+        session.latencies.record(0.05)
+    start = time.perf_counter()
+    assert session.head(server + "/slow").status_code == 200
+    # the duplicate request is answered before the stalled one
+    assert time.perf_counter() - start < 0.9
+    assert FlakyHandler.counts["/slow"] == 2
+    session.close()
+
+
+def test_latency_percentile():
+    tracker = LatencyTracker(minimum=10)
+    assert tracker.percentile(0.95) is None
+    for i in range(100):
+        tracker.record(i)
+    assert tracker.percentile(0.95) == 95
+
+
+def test_session_can_be_pickled():
+    session = pickle.loads(pickle.dumps(ResilientSession(retries=5)))
+    assert session.retries == 5
+    assert session.latencies.percentile(0.5) is None
+
+
+def test_limiter_grows_while_latency_is_flat():
+    limiter = ConcurrencyLimiter(max_limit=4)
+    for i in range(50):
+        for j in range(limiter.current_limit):
+            limiter.acquire()
+        for j in range(limiter.in_flight):
+            limiter.release(0.01, 200)
+    assert limiter.current_limit == 4
+
+
+def test_limiter_backs_off_on_overload_status():
+    limiter = ConcurrencyLimiter(max_limit=8, initial_limit=8)
+    limiter.acquire()
+    limiter.release(0.01, 503)
+    assert limiter.current_limit < 8
+
+
+def test_limiter_backs_off_on_rising_latency():
+    limiter = ConcurrencyLimiter(max_limit=8, initial_limit=8)
+    for i in range(20):
+        limiter.acquire()
+        limiter.release(0.01, 200)
+    for i in range(5):
+        limiter.acquire()
+        limiter.release(0.1, 200)
+    assert limiter.current_limit < 8
+
+
+def test_limiter_does_not_grow_on_failures():
+    limiter = ConcurrencyLimiter(max_limit=4)
+    for i in range(10):
+        limiter.acquire()
+        limiter.release(None)
+    assert limiter.current_limit == 1
+
+
+def test_refused_connections_shrink_the_limit():
+    # find a port that nothing listens on
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    url = "http://127.0.0.1:{0}/".format(httpd.server_port)
+    httpd.server_close()
+    session = ResilientSession(retries=0, max_concurrency=8)
+    session.limiter.limit = 8
+    with pytest.raises(requests.ConnectionError):
+        session.head(url)
+    assert session.limiter.current_limit < 8
+
+
+def test_requests_held_by_the_limiter_are_not_hedged(server):
+    session = ResilientSession(hedge=True, hedge_workers=16,
+                               max_concurrency=8, max_rate=20)
+    session.limiter.limit = 8
+    for i in range(20):
+        session.latencies.record(0.1)
+    threads = [threading.Thread(target=session.head, args=(server + "/fast",))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    session.executor.shutdown(wait=True)
+    # the later requests wait for the rate ceiling longer than the
+    # hedging threshold, but are only sent once
+    assert FlakyHandler.counts["/fast"] == 8
+    session.close()
+
+
+def test_max_rate(server):
+    session = ResilientSession(max_rate=20)
+    start = time.perf_counter()
+    for i in range(5):
+        session.head(server + "/fast")
+    assert time.perf_counter() - start >= 0.19
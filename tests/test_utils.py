@@ -1,4 +1,5 @@
-from fcrepo_verify.utils import get_data_dir, replace_strings_in_file
+from fcrepo_verify.utils import get_data_dir, replace_strings_in_file, \
+    get_child_name, get_directory_child_names, map_uri
 from fcrepo_verify.constants import BAG_DATA_DIR
 import os
 import tempfile
@@ -36,3 +37,24 @@ def test_replace_strings_in_file():
         assert dest.readline().startswith("confirm y")
         assert dest.readline() == "confirm z"
     os.remove(newfile)
+
+
+def test_get_directory_child_names():
+    localpath = tempfile.mkdtemp()
+    for name in ["a.ttl", "b.binary", "c%20d.external", "fcr%3Aversions.ttl",
+                 ".hidden.ttl", "notes.txt"]:
+        open(os.path.join(localpath, name), "w").close()
+    os.mkdir(os.path.join(localpath, "a"))
+    assert get_directory_child_names(localpath, ".ttl") == {"a", "b", "c d"}
+
+
+def test_get_child_name():
+    assert get_child_name("http://localhost/rest/a/c%20d/") == "c d"
+
+
+def test_map_uri():
+    source = "http://old:8080/rest"
+    target = "http://new:8080/fcrepo/rest"
+    assert map_uri(source + "/a/b", source, target) == target + "/a/b"
+    assert map_uri("http://other/rest/a", source, target) == \
+        "http://other/rest/a"